@@ -1,25 +1,37 @@
+import concurrent.futures
 import datetime
 import os
-from typing import Any, Dict
+import threading
+from functools import cached_property
+from typing import Any, Callable, Dict, Generator, Self, Union
 
 import click
 import humanize
-from pydantic import BaseModel, Field, field_validator, ValidationInfo, computed_field
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, field_validator, ValidationInfo, computed_field
 from typing import Optional, Annotated
 from simple_salesforce import Salesforce as SalesforceClient
 
 from salesforce_archivist.salesforce.api import SalesforceApiClient
 from salesforce_archivist.salesforce.download import (
+    DEFAULT_MAX_WORKERS,
     DownloadContentVersionList,
     DownloadedList,
     DownloadAttachmentList,
     DownloadStats,
 )
-from salesforce_archivist.salesforce.salesforce import Salesforce
+from salesforce_archivist.salesforce.salesforce import BULK_MAX_WORKERS, Salesforce
 from salesforce_archivist.salesforce.validation import ValidatedList, ValidationStats
 
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader  # type: ignore[assignment]
+
 
 class ArchivistObject(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     data_dir: Annotated[str, Field(min_length=1)]
     obj_type: Annotated[str, Field(min_length=1)]
     modified_date_lt: Optional[datetime.datetime] = None
@@ -37,14 +49,17 @@ class ArchivistObject(BaseModel):
             other.modified_date_lt,
         )
 
+    # object is immutable, so directory path is joined only once
     # https://github.com/python/mypy/issues/14461
     @computed_field  # type: ignore[misc]
-    @property
+    @cached_property
     def obj_dir(self) -> str:
         return os.path.join(self.data_dir, self.obj_type)
 
 
 class ArchivistAuth(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     instance_url: Annotated[str, Field(min_length=1)]
     username: Annotated[str, Field(min_length=1)]
     consumer_key: Annotated[str, Field(min_length=1)]
@@ -52,10 +67,13 @@ class ArchivistAuth(BaseModel):
 
 
 class ArchivistConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     auth: ArchivistAuth
     data_dir: Annotated[str, Field(min_length=1)]
     max_api_usage_percent: Optional[Annotated[float, Field(gt=0.0, le=100.0)]] = None
     max_workers: Optional[Annotated[int, Field(gt=0)]] = None
+    validation_max_workers: Optional[Annotated[int, Field(gt=0)]] = None
     modified_date_gt: Optional[datetime.datetime] = None
     modified_date_lt: Optional[datetime.datetime] = None
     objects: Dict[str, ArchivistObject]
@@ -74,38 +92,69 @@ class ArchivistConfig(BaseModel):
             )
         return objects
 
+    @classmethod
+    def from_file(cls, path: str) -> Self:
+        with open(path, "rb") as file:
+            return cls(**yaml.load(file.read(), Loader=YamlLoader))
+
 
 class Archivist:
     def __init__(
         self,
         data_dir: str,
         objects: dict[str, ArchivistObject],
-        sf_client: SalesforceClient,
+        sf_client: SalesforceClient | None = None,
         max_api_usage_percent: float | None = None,
         max_workers: int | None = None,
+        validation_max_workers: int | None = None,
+        sf_client_factory: Callable[[], SalesforceClient] | None = None,
     ):
         self._max_api_usage_percent = max_api_usage_percent
         self._objects = objects
         self._data_dir = data_dir
-        self._sf_client = sf_client
         self._max_workers = max_workers
+        self._validation_max_workers = validation_max_workers if validation_max_workers is not None else max_workers
+        self._api_client = SalesforceApiClient(sf_client=sf_client, sf_client_factory=sf_client_factory)
+        self._salesforce: dict[str, Salesforce] = {}
+        # lists of the next object are loaded while files are downloaded, so Bulk API jobs share the pool too
+        self._api_client.configure_connection_pool(
+            pool_size=(max_workers if max_workers is not None else DEFAULT_MAX_WORKERS) + BULK_MAX_WORKERS
+        )
 
-    def download(self) -> bool:
-        downloaded_content_versions_list = DownloadedList(self._data_dir, "downloaded_versions.csv")
-        if downloaded_content_versions_list.data_file_exist():
-            downloaded_content_versions_list.load_data_from_file()
+    def download(self, validate: bool = False) -> bool:
+        """
+        Download files of all objects.
 
-        downloaded_attachment_list = DownloadedList(self._data_dir, "downloaded_attachments.csv")
-        if downloaded_attachment_list.data_file_exist():
-            downloaded_attachment_list.load_data_from_file()
+        With `validate`, files of each object are validated right after they are downloaded, using lists
+        that are already in memory, instead of loading all lists again in a separate validation run.
+        """
+        downloaded_content_versions_list = self._load_downloaded_list("downloaded_versions.csv")
+        downloaded_attachment_list = self._load_downloaded_list("downloaded_attachments.csv")
+        validated_list = self._load_validated_list() if validate else None
 
         global_stats = DownloadStats()
-        for archivist_obj in self._objects.values():
+        global_validation_stats = ValidationStats()
+        for archivist_obj, download_list in self._prefetch_download_lists():
             obj_type = archivist_obj.obj_type
-            if obj_type == "Attachment":
-                self._download_attachments(archivist_obj, downloaded_attachment_list, global_stats)
-            else:
-                self._download_files(archivist_obj, downloaded_content_versions_list, global_stats)
+            downloaded_list = (
+                downloaded_attachment_list if obj_type == "Attachment" else downloaded_content_versions_list
+            )
+            self._print_msg(msg="Downloading files.", obj_type=obj_type)
+            stats = self._get_salesforce(archivist_obj).download_files(
+                download_list=download_list,
+                downloaded_list=downloaded_list,
+                max_workers=self._max_workers,
+            )
+            global_stats.combine(stats)
+            # there is no point in validating files that failed to download
+            if validated_list is not None and stats.errors == 0:
+                self._validate_download_list(
+                    archivist_obj=archivist_obj,
+                    download_list=download_list,
+                    validated_list=validated_list,
+                    downloaded_list=downloaded_content_versions_list,
+                    global_stats=global_validation_stats,
+                )
 
         status = "SUCCESS" if global_stats.errors == 0 else "FAILED"
         color = "green" if global_stats.errors == 0 else "red"
@@ -119,119 +168,125 @@ class Archivist:
             ),
             fg=color,
         )
-        return global_stats.errors == 0
+        if validated_list is None:
+            return global_stats.errors == 0
+        self._print_validation_summary(global_validation_stats)
+        return global_stats.errors == 0 and global_validation_stats.invalid == 0
 
-    def _download_files(
+    def _get_salesforce(self, archivist_obj: ArchivistObject) -> Salesforce:
+        # one instance per object, reused for loading lists, downloading and validating
+        if (salesforce := self._salesforce.get(archivist_obj.obj_type)) is None:
+            salesforce = self._salesforce[archivist_obj.obj_type] = Salesforce(
+                archivist_obj=archivist_obj,
+                client=self._api_client,
+                max_api_usage_percent=self._max_api_usage_percent,
+            )
+        return salesforce
+
+    def _prefetch_download_lists(
         self,
-        archivist_obj: ArchivistObject,
-        downloaded_list: DownloadedList,
-        global_stats: DownloadStats,
-    ) -> None:
-        obj_type = archivist_obj.obj_type
-        salesforce = Salesforce(
-            archivist_obj=archivist_obj,
-            client=SalesforceApiClient(self._sf_client),
-            max_api_usage_percent=self._max_api_usage_percent,
+    ) -> Generator[tuple[ArchivistObject, Union[DownloadContentVersionList, DownloadAttachmentList]], None, None]:
+        # Lists for the next object are loaded while files of the current one are downloaded or validated.
+        # Loading is mostly waiting for Bulk API jobs or reading CSV files, so it overlaps well with both.
+        objects = list(self._objects.values())
+        if not objects:
+            return
+        future = self._load_download_list_in_background(objects[0])
+        for index, archivist_obj in enumerate(objects):
+            download_list = future.result()
+            if index + 1 < len(objects):
+                future = self._load_download_list_in_background(objects[index + 1])
+            yield archivist_obj, download_list
+
+    def _load_download_list_in_background(
+        self, archivist_obj: ArchivistObject
+    ) -> concurrent.futures.Future[Union[DownloadContentVersionList, DownloadAttachmentList]]:
+        # Daemon thread is used instead of ThreadPoolExecutor, because executor waits for running Bulk API jobs
+        # when it is shut down or when interpreter exits, so Ctrl-C would hang until they finish.
+        future: concurrent.futures.Future[Union[DownloadContentVersionList, DownloadAttachmentList]] = (
+            concurrent.futures.Future()
         )
+
+        def load() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._load_download_list(archivist_obj))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=load, daemon=True).start()
+        return future
+
+    def _load_download_list(
+        self, archivist_obj: ArchivistObject
+    ) -> Union[DownloadContentVersionList, DownloadAttachmentList]:
+        if archivist_obj.obj_type == "Attachment":
+            return self._load_attachment_download_list(archivist_obj)
+        return self._load_content_version_download_list(archivist_obj)
+
+    def _load_content_version_download_list(self, archivist_obj: ArchivistObject) -> DownloadContentVersionList:
+        obj_type = archivist_obj.obj_type
+        salesforce = self._get_salesforce(archivist_obj)
         self._print_msg(msg="Downloading document link list.", obj_type=obj_type)
         document_link_list = salesforce.load_content_document_link_list()
         self._print_msg(msg="Done.", obj_type=obj_type)
         self._print_msg(msg="Downloading content version list.", obj_type=obj_type)
         content_version_list = salesforce.load_content_version_list(document_link_list=document_link_list)
         self._print_msg(msg="Done.", obj_type=obj_type)
-        self._print_msg(msg="Downloading files.", obj_type=obj_type)
-        download_list = DownloadContentVersionList(
+        return DownloadContentVersionList(
             document_link_list=document_link_list,
             content_version_list=content_version_list,
             data_dir=archivist_obj.obj_dir,
         )
-        stats = salesforce.download_files(
-            download_list=download_list,
-            downloaded_list=downloaded_list,
-            max_workers=self._max_workers,
-        )
-        global_stats.combine(stats)
 
-    def _download_attachments(
-        self, archivist_obj: ArchivistObject, downloaded_list: DownloadedList, global_stats: DownloadStats
-    ) -> None:
+    def _load_attachment_download_list(self, archivist_obj: ArchivistObject) -> DownloadAttachmentList:
         obj_type = archivist_obj.obj_type
-        salesforce = Salesforce(
-            archivist_obj=archivist_obj,
-            client=SalesforceApiClient(self._sf_client),
-            max_api_usage_percent=self._max_api_usage_percent,
-        )
+        salesforce = self._get_salesforce(archivist_obj)
         self._print_msg(msg="Downloading attachment list.", obj_type=obj_type)
         attachment_list = salesforce.load_attachment_list()
         self._print_msg(msg="Done.", obj_type=obj_type)
-        self._print_msg(msg="Downloading files.", obj_type=obj_type)
-        download_list = DownloadAttachmentList(
+        return DownloadAttachmentList(
             attachment_list=attachment_list,
             data_dir=archivist_obj.obj_dir,
         )
-        stats = salesforce.download_files(
-            download_list=download_list,
-            downloaded_list=downloaded_list,
-            max_workers=self._max_workers,
-        )
-        global_stats.combine(stats)
 
-    def _validate_content_versions_download(
-        self, archivist_obj: ArchivistObject, validated_list: ValidatedList, global_stats: ValidationStats
-    ) -> bool:
-        salesforce = Salesforce(
-            archivist_obj=archivist_obj,
-            client=SalesforceApiClient(self._sf_client),
-            max_api_usage_percent=self._max_api_usage_percent,
-        )
-        document_link_list = salesforce.load_content_document_link_list()
-        content_version_list = salesforce.load_content_version_list(
-            document_link_list=document_link_list,
-        )
-        download_list = DownloadContentVersionList(
-            document_link_list=document_link_list,
-            content_version_list=content_version_list,
-            data_dir=archivist_obj.obj_dir,
-        )
-        stats = salesforce.validate_download(
-            download_list=download_list,
-            validated_list=validated_list,
-            max_workers=self._max_workers,
-        )
-        global_stats.combine(stats)
-        return stats.invalid == 0
-
-    def _validate_attachments_download(
-        self, archivist_obj: ArchivistObject, validated_list: ValidatedList, global_stats: ValidationStats
-    ) -> bool:
-        salesforce = Salesforce(
-            archivist_obj=archivist_obj,
-            client=SalesforceApiClient(self._sf_client),
-            max_api_usage_percent=self._max_api_usage_percent,
-        )
-        attachment_list = salesforce.load_attachment_list()
-        download_list = DownloadAttachmentList(
-            attachment_list=attachment_list,
-            data_dir=archivist_obj.obj_dir,
-        )
-        stats = salesforce.validate_download(
+    def validate(self) -> bool:
+        validated_list = self._load_validated_list()
+        # checksums calculated during download let validation skip hashing of files
+        downloaded_content_versions_list = self._load_downloaded_list("downloaded_versions.csv")
+        global_stats = ValidationStats()
+        for archivist_obj, download_list in self._prefetch_download_lists():
+            self._validate_download_list(
+                archivist_obj=archivist_obj,
+                download_list=download_list,
+                validated_list=validated_list,
+                downloaded_list=downloaded_content_versions_list,
+                global_stats=global_stats,
+            )
+        self._print_validation_summary(global_stats)
+        return global_stats.invalid == 0
+
+    def _validate_download_list(
+        self,
+        archivist_obj: ArchivistObject,
+        download_list: Union[DownloadContentVersionList, DownloadAttachmentList],
+        validated_list: ValidatedList,
+        downloaded_list: DownloadedList,
+        global_stats: ValidationStats,
+    ) -> None:
+        obj_type = archivist_obj.obj_type
+        self._print_msg(msg="Validating files.", obj_type=obj_type)
+        stats = self._get_salesforce(archivist_obj).validate_download(
             download_list=download_list,
             validated_list=validated_list,
-            max_workers=self._max_workers,
+            max_workers=self._validation_max_workers,
+            downloaded_list=downloaded_list if obj_type != "Attachment" else None,
         )
         global_stats.combine(stats)
-        return stats.invalid == 0
 
-    def validate(self) -> bool:
-        validated_list = ValidatedList(self._data_dir)
-        if validated_list.data_file_exist():
-            validated_list.load_data_from_file()
-        global_stats = ValidationStats()
-        for archivist_obj in self._objects.values():
-            if archivist_obj.obj_type == "Attachment":
-                self._validate_attachments_download(archivist_obj, validated_list, global_stats)
-            else:
-                self._validate_content_versions_download(archivist_obj, validated_list, global_stats)
+    @staticmethod
+    def _print_validation_summary(global_stats: ValidationStats) -> None:
         status = "SUCCESS" if global_stats.invalid == 0 else "FAILED"
         color = "green" if global_stats.invalid == 0 else "red"
         click.secho(
@@ -240,7 +295,23 @@ class Archivist:
             ),
             fg=color,
         )
-        return global_stats.invalid == 0
+
+    # missing file is handled by catching the error instead of checking if it exists first, to open it only once
+    def _load_downloaded_list(self, file_name: str) -> DownloadedList:
+        downloaded_list = DownloadedList(self._data_dir, file_name)
+        try:
+            downloaded_list.load_data_from_file()
+        except FileNotFoundError:
+            pass
+        return downloaded_list
+
+    def _load_validated_list(self) -> ValidatedList:
+        validated_list = ValidatedList(self._data_dir)
+        try:
+            validated_list.load_data_from_file()
+        except FileNotFoundError:
+            pass
+        return validated_list
 
     @staticmethod
     def _print_msg(msg: str, obj_type: str, fg: str | None = None) -> None:
@@ -1,12 +1,15 @@
+from __future__ import annotations
+
 import signal
+from functools import partial
 from types import FrameType
+from typing import TYPE_CHECKING
 
 import click
-import yaml
 from click import Context
 
-from salesforce_archivist.archivist import Archivist, ArchivistConfig
-from simple_salesforce import Salesforce as SalesforceClient
+if TYPE_CHECKING:
+    from salesforce_archivist.archivist import Archivist, ArchivistConfig
 
 
 def signal_handler(signum: int, frame: FrameType | None) -> None:
@@ -20,51 +23,49 @@ signal.signal(signal.SIGINT, signal_handler)
 @click.group()
 @click.pass_context
 def cli(ctx: Context) -> None:
+    # archivist and Salesforce client modules take most of the startup time, so they are imported
+    # only when they are needed and not when e.g. only help is shown
+    from salesforce_archivist.archivist import ArchivistConfig
+
     ctx.ensure_object(dict)
-    with open("config.yaml") as file:
-        config = yaml.load(file, Loader=yaml.FullLoader)
-    ctx.obj["config"] = ArchivistConfig(**config)
+    ctx.obj["config"] = ArchivistConfig.from_file("config.yaml")
 
 
-@cli.command()
-@click.option("--validate", is_flag=True, default=False, help="Trigger validation after download.")
-@click.pass_context
-def download(ctx: Context, validate: bool) -> None:
-    config: ArchivistConfig = ctx.obj["config"]
-    sf_client = SalesforceClient(
+def _create_archivist(config: ArchivistConfig) -> Archivist:
+    from salesforce_archivist.archivist import Archivist
+    from simple_salesforce import Salesforce as SalesforceClient
+
+    # client logs into Salesforce when created, so it is created only when API is actually called
+    sf_client_factory = partial(
+        SalesforceClient,
         instance_url=config.auth.instance_url,
         username=config.auth.username,
         consumer_key=config.auth.consumer_key,
         privatekey=config.auth.private_key,
     )
-    archivist = Archivist(
+    return Archivist(
         data_dir=config.data_dir,
         objects=config.objects,
-        sf_client=sf_client,
+        sf_client_factory=sf_client_factory,
         max_api_usage_percent=config.max_api_usage_percent,
         max_workers=config.max_workers,
+        validation_max_workers=config.validation_max_workers,
     )
-    if not archivist.download() or validate and not archivist.validate():
+
+
+@cli.command()
+@click.option("--validate", is_flag=True, default=False, help="Trigger validation after download.")
+@click.pass_context
+def download(ctx: Context, validate: bool) -> None:
+    archivist = _create_archivist(ctx.obj["config"])
+    if not archivist.download(validate=validate):
         ctx.exit(code=1)
 
 
 @cli.command()
 @click.pass_context
 def validate(ctx: Context) -> None:
-    config: ArchivistConfig = ctx.obj["config"]
-    sf_client = SalesforceClient(
-        instance_url=config.auth.instance_url,
-        username=config.auth.username,
-        consumer_key=config.auth.consumer_key,
-        privatekey=config.auth.private_key,
-    )
-    archivist = Archivist(
-        data_dir=config.data_dir,
-        objects=config.objects,
-        sf_client=sf_client,
-        max_api_usage_percent=config.max_api_usage_percent,
-        max_workers=config.max_workers,
-    )
+    archivist = _create_archivist(ctx.obj["config"])
     if not archivist.validate():
         ctx.exit(code=1)
 
@@ -1,15 +1,23 @@
+import threading
+from typing import Callable, Optional, cast
+
 from requests import Response
+from requests.adapters import HTTPAdapter, Retry
 from simple_salesforce import Salesforce as SimpleSFClient
 from simple_salesforce.api import Usage
 
 from salesforce_archivist.salesforce.attachment import Attachment
 from salesforce_archivist.salesforce.content_version import ContentVersion
 
+CONNECT_RETRIES = 3
+
 
 class ApiUsage:
     def __init__(self, usage: Usage):
         self._used: int = usage.used
         self._total: int = usage.total
+        # usage does not change after creation, percent is read for every download message
+        self._percent: float = round(self._used / self._total * 100, 2) if self._total > 0 else 0.0
 
     @property
     def used(self) -> int:
@@ -21,12 +29,56 @@ class ApiUsage:
 
     @property
     def percent(self) -> float:
-        return round(self.used / self.total * 100, 2) if self.total > 0 else 0.0
+        return self._percent
 
 
 class SalesforceApiClient:
-    def __init__(self, sf_client: SimpleSFClient):
-        self._simple_sf_client = sf_client
+    def __init__(
+        self,
+        sf_client: Optional[SimpleSFClient] = None,
+        sf_client_factory: Optional[Callable[[], SimpleSFClient]] = None,
+    ):
+        """
+        Client can be given directly or created by `sf_client_factory` on first API call. Creating client logs
+        into Salesforce, so it is skipped entirely when all lists and files are already on disk.
+        """
+        if sf_client is None and sf_client_factory is None:
+            raise ValueError("Either sf_client or sf_client_factory must be provided")
+        self._sf_client = sf_client
+        self._sf_client_factory = sf_client_factory
+        self._pool_size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _simple_sf_client(self) -> SimpleSFClient:
+        if self._sf_client is None:
+            with self._lock:
+                if self._sf_client is None and self._sf_client_factory is not None:
+                    sf_client = self._sf_client_factory()
+                    if self._pool_size is not None:
+                        self._mount_adapter(sf_client, self._pool_size)
+                    self._sf_client = sf_client
+        return cast(SimpleSFClient, self._sf_client)
+
+    def configure_connection_pool(self, pool_size: int) -> None:
+        """
+        Keep up to `pool_size` HTTPS connections alive, so each download worker can reuse its own connection
+        instead of opening a new one (with TLS handshake) when default pool of 10 connections is exhausted.
+
+        Failed connection attempts are retried, request was not sent yet then, so it is safe for any request.
+        """
+        with self._lock:
+            self._pool_size = pool_size
+            if self._sf_client is not None:
+                self._mount_adapter(self._sf_client, pool_size)
+
+    @staticmethod
+    def _mount_adapter(sf_client: SimpleSFClient, pool_size: int) -> None:
+        adapter = HTTPAdapter(
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=None, connect=CONNECT_RETRIES, read=False, status=0, other=0, backoff_factor=0.5),
+        )
+        sf_client.session.mount("https://", adapter)
 
     def bulk2(self, query: str, path: str, max_records: int) -> list[dict]:
         result: list[dict] = self._simple_sf_client.bulk2.Account.download(
@@ -54,7 +106,23 @@ class SalesforceApiClient:
         )
         return result
 
+    def get_reported_api_usage(self) -> Optional[ApiUsage]:
+        """
+        API usage reported by the last Salesforce response, or None when nothing was reported yet.
+
+        Unlike `get_api_usage`, it never calls Salesforce and never creates client, so it can be used
+        in messages printed when no API call was made, e.g. when all files are already downloaded.
+        """
+        if self._sf_client is None:
+            return None
+        usage = self._sf_client.api_usage.get("api-usage")
+        return ApiUsage(usage) if isinstance(usage, Usage) else None
+
     def get_api_usage(self, refresh: bool = False) -> ApiUsage:
+        """
+        API usage reported by the last Salesforce response. Salesforce is called for it (creating client first
+        if needed) when `refresh` is set or when no usage was reported yet.
+        """
         if refresh or self._simple_sf_client.api_usage.get("api-usage") is None:
             self._simple_sf_client.limits()
         return ApiUsage(self._simple_sf_client.api_usage["api-usage"])
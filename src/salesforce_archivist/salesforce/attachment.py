@@ -1,10 +1,15 @@
 import csv
-import re
+from collections import defaultdict
 import os.path
+import sys
 from typing import Any, Generator
 
+from salesforce_archivist.salesforce.filename import FILENAME_TRANSLATION
+
 
 class Attachment:
+    __slots__ = ("_id", "_parent_id", "_name", "_content_size")
+
     def __init__(
         self,
         attachment_id: str,
@@ -13,7 +18,7 @@ class Attachment:
         content_size: int,
     ):
         self._id = attachment_id
-        self._parent_id = parent_id
+        self._parent_id = sys.intern(parent_id)
         self._name = name
         self._content_size = content_size
 
@@ -38,7 +43,7 @@ class Attachment:
         return "{id}_{name}".format(
             id=self.id,
             # TODO make it configurable
-            name=re.sub(r'[/\\?%*:|"<>]', "-", self.name),
+            name=self.name.translate(FILENAME_TRANSLATION),
         )
 
     def __eq__(self, other: Any) -> bool:
@@ -61,7 +66,7 @@ class AttachmentList:
     def __init__(self, data_dir: str):
         self._data: dict[str, Attachment] = {}
         self._path = os.path.join(data_dir, "attachments.csv")
-        self._parent_attachment_map: dict[str, set[str]] = {}
+        self._parent_attachment_map: defaultdict[str, set[str]] = defaultdict(set)
 
     def data_file_exist(self) -> bool:
         return os.path.exists(self._path)
@@ -83,29 +88,26 @@ class AttachmentList:
         with open(self._path, "w") as file:
             writer = csv.writer(file)
             writer.writerow(["Id", "ParentId", "ContentSize", "Name"])
-            for attachment_id, attachment in self._data.items():
-                writer.writerow(
-                    [
-                        attachment.id,
-                        attachment.parent_id,
-                        attachment.content_size,
-                        attachment.name,
-                    ]
-                )
+            writer.writerows(
+                [
+                    attachment.id,
+                    attachment.parent_id,
+                    attachment.content_size,
+                    attachment.name,
+                ]
+                for attachment in self._data.values()
+            )
 
     def get_attachment(self, attachment_id: str) -> Attachment | None:
         return self._data.get(attachment_id)
 
     def add_attachment(self, attachment: Attachment) -> None:
-        if attachment.parent_id not in self._parent_attachment_map:
-            self._parent_attachment_map[attachment.parent_id] = set()
         self._parent_attachment_map[attachment.parent_id].add(attachment.id)
         self._data[attachment.id] = attachment
 
     def get_attachments_for_parent(self, parent_id: str) -> Generator[Attachment, None, None]:
-        if parent_id in self._parent_attachment_map:
-            for attachment_id in self._parent_attachment_map[parent_id]:
-                yield self._data[attachment_id]
+        for attachment_id in self._parent_attachment_map.get(parent_id, ()):
+            yield self._data[attachment_id]
 
     def __len__(self) -> int:
         return len(self._data)
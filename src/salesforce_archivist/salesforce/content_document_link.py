@@ -1,18 +1,22 @@
 import csv
 import os.path
+import sys
 from typing import Any, Generator
 
 
 class ContentDocumentLink:
+    __slots__ = ("_linked_entity_id", "_content_document_id", "_download_dir_name")
+
     def __init__(
         self,
         linked_entity_id: str,
         content_document_id: str,
         download_dir_name: str | None = None,
     ):
-        self._linked_entity_id = linked_entity_id
-        self._content_document_id = content_document_id
-        self._download_dir_name = download_dir_name
+        # entity and document ids repeat across links and versions, keep one copy of each in memory
+        self._linked_entity_id = sys.intern(linked_entity_id)
+        self._content_document_id = sys.intern(content_document_id)
+        self._download_dir_name = sys.intern(download_dir_name) if download_dir_name is not None else None
 
     @property
     def linked_entity_id(self) -> str:
@@ -37,7 +41,7 @@ class ContentDocumentLink:
 
 class ContentDocumentLinkList:
     def __init__(self, data_dir: str, dir_name_field: str | None = None):
-        self._data: dict[str, ContentDocumentLink] = {}
+        self._data: dict[tuple[str, str], ContentDocumentLink] = {}
         self._path = os.path.join(data_dir, "document_links.csv")
         self._dir_name_field = dir_name_field
 
@@ -63,29 +67,28 @@ class ContentDocumentLinkList:
             if self._dir_name_field is not None:
                 header.append(self._dir_name_field)
             writer.writerow(header)
-            for doc_link_id, link in self._data.items():
-                row = [
-                    link.linked_entity_id,
-                    link.content_document_id,
-                ]
-                if link.download_dir_name is not None:
-                    row.append(link.download_dir_name)
-                writer.writerow(row)
+            writer.writerows(self._to_row(link) for link in self._data.values())
+
+    @staticmethod
+    def _to_row(link: ContentDocumentLink) -> list[str]:
+        row = [
+            link.linked_entity_id,
+            link.content_document_id,
+        ]
+        if link.download_dir_name is not None:
+            row.append(link.download_dir_name)
+        return row
 
     def add_link(self, doc_link: ContentDocumentLink) -> None:
-        key = "{linked_id}_{document_id}".format(
-            linked_id=doc_link.linked_entity_id,
-            document_id=doc_link.content_document_id,
-        )
-        self._data[key] = doc_link
+        # tuple of already interned ids, no new key string is built for every link
+        self._data[(doc_link.linked_entity_id, doc_link.content_document_id)] = doc_link
 
     @property
     def path(self) -> str:
         return self._path
 
     def __iter__(self) -> Generator[ContentDocumentLink, None, None]:
-        for link in self._data.values():
-            yield link
+        yield from self._data.values()
 
     def __len__(self) -> int:
         return len(self._data)
@@ -1,12 +1,26 @@
 import csv
+from collections import defaultdict
 import os.path
-import re
+import sys
 from typing import Any, Generator
 
 from salesforce_archivist.salesforce.content_document_link import ContentDocumentLink
+from salesforce_archivist.salesforce.filename import FILENAME_TRANSLATION
 
 
 class ContentVersion:
+    # lists can hold millions of records, slots keep each of them small
+    __slots__ = (
+        "_id",
+        "_document_id",
+        "_title",
+        "_extension",
+        "_checksum",
+        "_version_number",
+        "_content_size",
+        "_filename",
+    )
+
     def __init__(
         self,
         version_id: str,
@@ -18,12 +32,13 @@ class ContentVersion:
         content_size: int,
     ):
         self._id = version_id
-        self._document_id = document_id
+        self._document_id = sys.intern(document_id)
         self._title = title
         self._extension = extension
         self._checksum = checksum
         self._version_number = version_number
         self._content_size = content_size
+        self._filename: str | None = None
 
     @property
     def id(self) -> str:
@@ -55,14 +70,18 @@ class ContentVersion:
 
     @property
     def filename(self) -> str:
-        return "{doc_id}_{version_number}_{id}_{title}.{extension}".format(
-            doc_id=self.document_id,
-            id=self.id,
-            # TODO make it configurable
-            title=re.sub(r'[/\\?%*:|"<>]', "-", self.title),
-            extension=self.extension,
-            version_number=self.version_number,
-        )
+        # version is asked for file name once per linked entity, build it only once
+        # cached_property needs __dict__, so the value is kept in a slot instead
+        if self._filename is None:
+            self._filename = "{doc_id}_{version_number}_{id}_{title}.{extension}".format(
+                doc_id=self.document_id,
+                id=self.id,
+                # TODO make it configurable
+                title=self.title.translate(FILENAME_TRANSLATION),
+                extension=self.extension,
+                version_number=self.version_number,
+            )
+        return self._filename
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, type(self)):
@@ -90,7 +109,7 @@ class ContentVersionList:
     def __init__(self, data_dir: str):
         self._data: dict[str, ContentVersion] = {}
         self._path = os.path.join(data_dir, "content_versions.csv")
-        self._doc_versions_map: dict[str, set[str]] = {}
+        self._doc_versions_map: defaultdict[str, set[str]] = defaultdict(set)
 
     def data_file_exist(self) -> bool:
         return os.path.exists(self._path)
@@ -117,32 +136,33 @@ class ContentVersionList:
             writer.writerow(
                 ["Id", "ContentDocumentId", "Checksum", "Title", "FileExtension", "VersionNumber", "ContentSize"]
             )
-            for version_id, version in self._data.items():
-                writer.writerow(
-                    [
-                        version.id,
-                        version.document_id,
-                        version.checksum,
-                        version.title,
-                        version.extension,
-                        version.version_number,
-                        version.content_size,
-                    ]
-                )
+            writer.writerows(
+                [
+                    version.id,
+                    version.document_id,
+                    version.checksum,
+                    version.title,
+                    version.extension,
+                    version.version_number,
+                    version.content_size,
+                ]
+                for version in self._data.values()
+            )
 
     def get_content_version(self, version_id: str) -> ContentVersion | None:
         return self._data.get(version_id)
 
     def add_version(self, version: ContentVersion) -> None:
-        if version.document_id not in self._doc_versions_map:
-            self._doc_versions_map[version.document_id] = set()
         self._doc_versions_map[version.document_id].add(version.id)
         self._data[version.id] = version
 
     def get_content_versions_for_link(self, link: ContentDocumentLink) -> Generator[ContentVersion, None, None]:
-        if link.content_document_id in self._doc_versions_map:
-            for version_id in self._doc_versions_map[link.content_document_id]:
-                yield self._data[version_id]
+        # get() does not add empty sets for documents without versions, like indexing defaultdict would
+        for version_id in self._doc_versions_map.get(link.content_document_id, ()):
+            yield self._data[version_id]
+
+    def count_content_versions_for_link(self, link: ContentDocumentLink) -> int:
+        return len(self._doc_versions_map.get(link.content_document_id, ()))
 
     def __len__(self) -> int:
         return len(self._data)
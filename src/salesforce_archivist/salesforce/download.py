@@ -1,23 +1,86 @@
 import concurrent.futures
 import csv
+import hashlib
+import itertools
 import os
 import shutil
 import threading
-from time import sleep
-from typing import Generator, Any, Union, Self
+from time import sleep, monotonic
+from typing import Generator, Any, Iterable, Optional, Union, Self
 
 import click
 
 from salesforce_archivist.salesforce.api import SalesforceApiClient
 from salesforce_archivist.salesforce.attachment import Attachment, AttachmentList
-from salesforce_archivist.salesforce.content_document_link import ContentDocumentLinkList
+from salesforce_archivist.salesforce.content_document_link import ContentDocumentLink, ContentDocumentLinkList
 from salesforce_archivist.salesforce.content_version import ContentVersion, ContentVersionList
 
+# Downloads are network bound, so default pool size is not derived from CPU count like in ThreadPoolExecutor.
+DEFAULT_MAX_WORKERS = 16
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# How many not yet started tasks per worker can wait in executor queue. Work lists are generated lazily,
+# so this keeps memory usage flat regardless of number of files.
+PENDING_TASKS_PER_WORKER = 4
+# Progress lines of downloads and validation are written in batches, at least once per OUTPUT_FLUSH_SEC,
+# so workers don't contend on terminal output for every file.
+OUTPUT_BATCH_SIZE = 64
+OUTPUT_FLUSH_SEC = 1.0
+DOWNLOADED_LIST_HEADER = ["Id", "Path on disk", "Checksum", "Size", "Modified Time"]
+
+
+def file_ends_with_newline(path: str) -> bool:
+    """
+    Check if file is empty or ends with new line, i.e. its last line was not cut off while being written.
+    """
+    with open(path, "rb") as file:
+        if file.seek(0, os.SEEK_END) == 0:
+            return True
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+class DirectoryListing:
+    """
+    Find files by listing each directory once instead of calling stat for every file.
+
+    Files of one link or parent share a directory, so a single scandir call answers checks for all of them.
+    Listing is a snapshot, files created after directory was listed are not found until `clear()` is called.
+    """
+
+    def __init__(self) -> None:
+        self._listing: dict[str, dict[str, os.DirEntry[str]]] = {}
+
+    def find(self, path: str) -> os.DirEntry[str] | None:
+        dir_path, file_name = os.path.split(path)
+        if (files := self._listing.get(dir_path)) is None:
+            try:
+                with os.scandir(dir_path) as entries:
+                    files = {entry.name: entry for entry in entries if entry.is_file()}
+            except OSError:
+                files = {}
+            self._listing[dir_path] = files
+        return files.get(file_name)
+
+    def clear(self) -> None:
+        self._listing.clear()
+
 
 class DownloadedSalesforceObject:
-    def __init__(self, obj_id: str, path: str):
+    __slots__ = ("_id", "_path", "_checksum", "_content_size", "_modified_time_ns")
+
+    def __init__(
+        self,
+        obj_id: str,
+        path: str,
+        checksum: Optional[str] = None,
+        content_size: Optional[int] = None,
+        modified_time_ns: Optional[int] = None,
+    ):
         self._id = obj_id
         self._path = path
+        self._checksum = checksum
+        self._content_size = content_size
+        self._modified_time_ns = modified_time_ns
 
     @property
     def id(self) -> str:
@@ -27,6 +90,23 @@ class DownloadedSalesforceObject:
     def path(self) -> str:
         return self._path
 
+    @property
+    def checksum(self) -> Optional[str]:
+        return self._checksum
+
+    @property
+    def content_size(self) -> Optional[int]:
+        return self._content_size
+
+    @property
+    def modified_time_ns(self) -> Optional[int]:
+        return self._modified_time_ns
+
+    def matches_stat(self, file_stat: os.stat_result) -> bool:
+        if self._content_size is None or self._modified_time_ns is None:
+            return False
+        return (self._content_size, self._modified_time_ns) == (file_stat.st_size, file_stat.st_mtime_ns)
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, type(self)):
             return NotImplemented
@@ -34,39 +114,107 @@ class DownloadedSalesforceObject:
 
 
 class DownloadedList:
-    def __init__(self, data_dir: str, file_name: str):
+    def __init__(self, data_dir: str, file_name: str, checkpoint_size: int = 50):
         self._data: dict[str, DownloadedSalesforceObject] = {}
         self._path = os.path.join(data_dir, file_name)
+        self._checkpoint_size = checkpoint_size
+        self._unsaved: list[DownloadedSalesforceObject] = []
+        # number of rows in data file, None when file was not loaded or written yet
+        self._file_rows: int | None = None
+        # file has outdated header or broken rows, so it is rewritten instead of appended to
+        self._rewrite_needed = False
+        self._lock = threading.Lock()
 
     def data_file_exist(self) -> bool:
         return os.path.exists(self._path)
 
     def load_data_from_file(self) -> None:
+        # Process killed while checkpoint is appended can leave the last row cut off. It is skipped together
+        # with rows that can't be parsed, and file is rewritten on next save, so no rows are appended to it.
+        complete = file_ends_with_newline(self._path)
         with open(self._path) as file:
             reader = csv.reader(file)
-            next(reader)
-            for row in reader:
-                obj = DownloadedSalesforceObject(
-                    obj_id=row[0],
-                    path=row[1],
-                )
-                self.add(obj=obj)
+            # files downloaded by older versions have no checksum columns in header and rows
+            self._rewrite_needed = not complete or next(reader, None) != DOWNLOADED_LIST_HEADER
+            rows: Iterable[list[str]] = reader if complete else (row for row, _ in itertools.pairwise(reader))
+            file_rows = 0
+            for row in rows:
+                file_rows += 1
+                try:
+                    obj = DownloadedSalesforceObject(
+                        obj_id=row[0],
+                        path=row[1],
+                        checksum=row[2] if len(row) > 2 and row[2] else None,
+                        content_size=int(row[3]) if len(row) > 3 and row[3] else None,
+                        modified_time_ns=int(row[4]) if len(row) > 4 and row[4] else None,
+                    )
+                except (IndexError, ValueError):
+                    self._rewrite_needed = True
+                    continue
+                self._data[obj.id] = obj
+        self._file_rows = file_rows
 
     def save(self) -> None:
         os.makedirs(os.path.dirname(self._path), exist_ok=True)
-        with open(self._path, "w") as file:
+        with self._lock:
+            # Only append new entries while file has no more than twice as many rows as there are entries,
+            # otherwise rewrite it to drop replaced entries.
+            if (
+                not self._rewrite_needed
+                and self._file_rows is not None
+                and self._file_rows + len(self._unsaved) <= 2 * len(self._data)
+            ):
+                self._save_checkpoint()
+                return
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        tmp_path = "{path}.tmp".format(path=self._path)
+        with open(tmp_path, "w") as file:
             writer = csv.writer(file)
-            writer.writerow(["Id", "Path on disk"])
-            for _, sf_obj in self._data.items():
-                writer.writerow(
-                    [
-                        sf_obj.id,
-                        sf_obj.path,
-                    ]
-                )
+            writer.writerow(DOWNLOADED_LIST_HEADER)
+            writer.writerows(self._to_row(sf_obj) for sf_obj in self._data.values())
+        os.replace(tmp_path, self._path)
+        self._file_rows = len(self._data)
+        self._rewrite_needed = False
+        self._unsaved.clear()
+
+    def _save_checkpoint(self) -> None:
+        # Append only new entries so progress is not lost if process is killed. Entries added again
+        # are appended again and the last one wins on load, save() compacts the file when needed.
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        if self._rewrite_needed:
+            self._rewrite()
+            return
+        write_header = not os.path.exists(self._path)
+        with open(self._path, "a") as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(DOWNLOADED_LIST_HEADER)
+                self._file_rows = 0
+            writer.writerows(self._to_row(sf_obj) for sf_obj in self._unsaved)
+            file.flush()
+            os.fsync(file.fileno())
+        if self._file_rows is not None:
+            self._file_rows += len(self._unsaved)
+        self._unsaved.clear()
+
+    @staticmethod
+    def _to_row(sf_obj: DownloadedSalesforceObject) -> list[Any]:
+        return [
+            sf_obj.id,
+            sf_obj.path,
+            sf_obj.checksum or "",
+            sf_obj.content_size if sf_obj.content_size is not None else "",
+            sf_obj.modified_time_ns if sf_obj.modified_time_ns is not None else "",
+        ]
 
     def add(self, obj: DownloadedSalesforceObject) -> None:
-        self._data[obj.id] = obj
+        with self._lock:
+            self._data[obj.id] = obj
+            self._unsaved.append(obj)
+            if len(self._unsaved) >= self._checkpoint_size:
+                self._save_checkpoint()
 
     def is_downloaded(self, obj: Union[ContentVersion, Attachment]) -> bool:
         return obj.id in self._data
@@ -92,27 +240,30 @@ class DownloadContentVersionList:
         self._document_link_list = document_link_list
         self._content_version_list = content_version_list
         self._data_dir = data_dir
-        self._to_download: list[tuple[ContentVersion, str]] | None = None
 
-    def _generate_download_list(self) -> list[tuple[ContentVersion, str]]:
-        if self._to_download is None:
-            self._to_download = []
-            for link in self._document_link_list:
-                for version in self._content_version_list.get_content_versions_for_link(link):
-                    path = os.path.join(
-                        self._data_dir,
-                        "files",
-                        link.download_dir_name,
-                        version.filename,
-                    )
-                    self._to_download.append((version, path))
-        return self._to_download
+    def _links_by_dir(self) -> dict[str, dict[str, ContentDocumentLink]]:
+        # Links of different entities can share download directory, and document linked to more than one of them
+        # would be listed twice under the same path, so only one link per directory and document is kept.
+        links_by_dir: dict[str, dict[str, ContentDocumentLink]] = {}
+        for link in self._document_link_list:
+            links_by_dir.setdefault(link.download_dir_name, {}).setdefault(link.content_document_id, link)
+        return links_by_dir
 
     def __iter__(self) -> Generator[tuple[ContentVersion, str], None, None]:
-        yield from self._generate_download_list()
+        base_dir = os.path.join(self._data_dir, "files")
+        for download_dir_name, links in self._links_by_dir().items():
+            # file names never contain path separators, so plain concatenation gives the same result as join
+            link_dir_prefix = os.path.join(base_dir, download_dir_name, "")
+            for link in links.values():
+                for version in self._content_version_list.get_content_versions_for_link(link):
+                    yield version, link_dir_prefix + version.filename
 
     def __len__(self) -> int:
-        return len(self._generate_download_list())
+        return sum(
+            self._content_version_list.count_content_versions_for_link(link)
+            for links in self._links_by_dir().values()
+            for link in links.values()
+        )
 
 
 class DownloadAttachmentList:
@@ -123,27 +274,15 @@ class DownloadAttachmentList:
     ):
         self._attachment_list = attachment_list
         self._data_dir = data_dir
-        self._to_download: list[tuple[Attachment, str]] | None = None
-
-    def _generate_download_list(self) -> list[tuple[Attachment, str]]:
-        if self._to_download is None:
-            self._to_download = []
-
-            for attachment in self._attachment_list:
-                path = os.path.join(
-                    self._data_dir,
-                    "files",
-                    attachment.parent_id,
-                    attachment.filename,
-                )
-                self._to_download.append((attachment, path))
-        return self._to_download
 
     def __iter__(self) -> Generator[tuple[Attachment, str], None, None]:
-        yield from self._generate_download_list()
+        base_dir_prefix = os.path.join(self._data_dir, "files", "")
+        for attachment in self._attachment_list:
+            # ids and file names never contain path separators, so plain concatenation gives the same result as join
+            yield attachment, base_dir_prefix + attachment.parent_id + os.sep + attachment.filename
 
     def __len__(self) -> int:
-        return len(self._generate_download_list())
+        return len(self._attachment_list)
 
 
 class DownloadStats:
@@ -190,6 +329,92 @@ class DownloadStats:
         return self
 
 
+class AdaptiveConcurrency:
+    """
+    Concurrency gate for workers that adjusts its limit based on API usage and observed throughput.
+
+    Limit starts at `max_limit` and shrinks by one every `window` completed downloads while API usage is above 90%
+    of allowed maximum. Once usage drops below 80% of it, limit grows back one step per window. Throughput (EWMA
+    of bytes per second) is only used to judge own increases: if it drops by more than `tolerance` in the window
+    after an increase, that step is rolled back. Throughput changes not following an increase are ignored, they
+    come mostly from the mix of file sizes and not from concurrency.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        max_api_usage_percent: float | None = None,
+        initial_limit: int | None = None,
+        window: int = 20,
+        smoothing: float = 0.3,
+        tolerance: float = 0.1,
+    ):
+        self._max_limit = max(1, max_limit)
+        self._limit = min(self._max_limit, initial_limit or self._max_limit)
+        self._max_api_usage_percent = max_api_usage_percent
+        self._window = window
+        self._smoothing = smoothing
+        self._tolerance = tolerance
+        self._active = 0
+        self._completed = 0
+        self._window_size = 0
+        self._window_start = monotonic()
+        self._throughput: float | None = None
+        # throughput measured right before the last increase, until the increase is judged
+        self._throughput_before_increase: float | None = None
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def acquire(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+
+    def release(self, size: int, api_usage_percent: float | None = None) -> None:
+        with self._condition:
+            self._active -= 1
+            self._completed += 1
+            self._window_size += size
+            if self._completed % self._window == 0:
+                self._adjust(api_usage_percent)
+            self._condition.notify_all()
+
+    def _adjust(self, api_usage_percent: float | None) -> None:
+        now = monotonic()
+        elapsed = now - self._window_start
+        sample = self._window_size / elapsed if elapsed > 0 else 0.0
+        self._window_start = now
+        self._window_size = 0
+
+        if self._throughput is None:
+            self._throughput = sample
+        else:
+            self._throughput = self._smoothing * sample + (1 - self._smoothing) * self._throughput
+
+        api_usage_high = api_usage_low = False
+        if self._max_api_usage_percent is not None and api_usage_percent is not None:
+            api_usage_high = api_usage_percent > self._max_api_usage_percent * 0.9
+            api_usage_low = api_usage_percent < self._max_api_usage_percent * 0.8
+        else:
+            api_usage_low = True
+
+        throughput_before_increase = self._throughput_before_increase
+        self._throughput_before_increase = None
+        if api_usage_high:
+            self._limit = max(1, self._limit - 1)
+        elif throughput_before_increase is not None and self._throughput < throughput_before_increase * (
+            1 - self._tolerance
+        ):
+            # last increase made things worse
+            self._limit = max(1, self._limit - 1)
+        elif api_usage_low and self._limit < self._max_limit:
+            self._throughput_before_increase = self._throughput
+            self._limit += 1
+
+
 class Downloader:
     def __init__(
         self,
@@ -201,15 +426,59 @@ class Downloader:
         self._client = sf_client
         self._max_api_usage_percent = max_api_usage_percent
         self._wait_sec = wait_sec
+        self._created_dirs: set[str] = set()
         self._stats = DownloadStats()
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
-        self._max_workers = max_workers
+        self._max_workers = max_workers if max_workers is not None else DEFAULT_MAX_WORKERS
+        self._concurrency = AdaptiveConcurrency(
+            max_limit=self._max_workers,
+            max_api_usage_percent=max_api_usage_percent,
+        )
+        self._output: list[str] = []
+        self._output_flushed_at = monotonic()
+        self._dir_listing = DirectoryListing()
 
     def _download_file_from_sf_api(
-        self, downloaded_list: DownloadedList, download_obj: Union[ContentVersion, Attachment], download_path: str
-    ) -> None:
-        pass
+        self, download_obj: Union[ContentVersion, Attachment], download_path: str
+    ) -> str | None:
+        if isinstance(download_obj, ContentVersion):
+            result = self._client.download_content_version(download_obj)
+        elif isinstance(download_obj, Attachment):
+            result = self._client.download_attachment(download_obj)
+        else:
+            raise ValueError("Unknown object type provided {type}".format(type=type(download_obj)))
+
+        self._make_download_dir(download_path)
+        # TLS encrypted socket can't be spliced into a file by kernel, so copy decoded body from raw stream
+        # in big blocks instead of iterating over small chunks
+        with result, open(download_path, "wb") as file:
+            result.raw.decode_content = True
+            # Salesforce gives MD5 checksums only for content versions, hash them on the way to disk
+            # so validation does not have to read the file again
+            if not isinstance(download_obj, ContentVersion):
+                shutil.copyfileobj(result.raw, file, length=DOWNLOAD_CHUNK_SIZE)
+                return None
+            hash_md5 = hashlib.md5()
+            while chunk := result.raw.read(DOWNLOAD_CHUNK_SIZE):
+                hash_md5.update(chunk)
+                file.write(chunk)
+        return hash_md5.hexdigest()
+
+    def _make_download_dir(self, download_path: str) -> None:
+        # files of one link or parent share a directory, so create it only for the first of them
+        download_dir = os.path.dirname(download_path)
+        if download_dir not in self._created_dirs:
+            os.makedirs(download_dir, exist_ok=True)
+            self._created_dirs.add(download_dir)
+
+    def _get_api_usage(self) -> float | None:
+        # usage reported with the last response is enough here, reading it must not log in or call Salesforce
+        try:
+            api_usage = self._client.get_reported_api_usage()
+        except Exception:
+            return None
+        return float(api_usage.percent) if api_usage is not None else None
 
     def download_file_from_sf(
         self,
@@ -232,50 +501,61 @@ class Downloader:
         elif downloaded_file is not None and os.path.exists(downloaded_file.path):
             # copy existing file if download path is different from already downloaded path in the list
             if downloaded_file.path != download_path:
-                os.makedirs(os.path.dirname(download_path), exist_ok=True)
-                shutil.copy(downloaded_file.path, download_path)
+                self._make_download_dir(download_path)
+                # copyfile lets kernel copy data with sendfile, without mode copying done by shutil.copy
+                shutil.copyfile(downloaded_file.path, download_path)
 
         # download file using SF API and add to the list
         else:
-            if isinstance(download_obj, ContentVersion):
-                result = self._client.download_content_version(download_obj)
-            elif isinstance(download_obj, Attachment):
-                result = self._client.download_attachment(download_obj)
-            else:
-                raise ValueError("Unknown object type provided {type}".format(type=type(download_obj)))
-
-            os.makedirs(os.path.dirname(download_path), exist_ok=True)
-            with open(download_path, "wb") as file:
-                for chunk in result.iter_content(chunk_size=1024):
-                    if chunk:
-                        file.write(chunk)
+            self._concurrency.acquire()
+            try:
+                checksum = self._download_file_from_sf_api(download_obj=download_obj, download_path=download_path)
+            finally:
+                self._concurrency.release(size=download_obj.content_size, api_usage_percent=self._get_api_usage())
 
+            file_stat = os.stat(download_path)
             downloaded_file = DownloadedSalesforceObject(
                 obj_id=download_obj.id,
                 path=download_path,
+                checksum=checksum,
+                content_size=file_stat.st_size,
+                modified_time_ns=file_stat.st_mtime_ns,
             )
             downloaded_list.add(downloaded_file)
 
     def _print_download_msg(self, msg: str, error: bool = False) -> None:
+        # only usage that is already known is shown, reading it must not log in or call Salesforce
         try:
-            api_usage: float = self._client.get_api_usage().percent
+            api_usage = self._client.get_reported_api_usage()
         except Exception:
-            api_usage = 0.0
+            api_usage = None
+        usage = "{:6.2f}%".format(api_usage.percent) if api_usage is not None else "  -.--%"
 
         percent = self._stats.processed / self._stats.total * 100 if self._stats.total > 0 else 0.0
         item_padded = "{{:{width}d}}".format(width=len(str(self._stats.total))).format(self._stats.processed)
 
-        click.secho(
-            "[{emoji} {downloaded}/{total} {percent:6.2f}%] [☁️{usage:6.2f}%] {msg}".format(
-                emoji="✓" if not error else "✗",
-                downloaded=item_padded,
-                percent=percent,
-                total=self._stats.total,
-                usage=api_usage,
-                msg=msg,
-            ),
-            fg="red" if error else None,
+        self._output.append(
+            click.style(
+                "[{emoji} {downloaded}/{total} {percent:6.2f}%] [☁️{usage}] {msg}".format(
+                    emoji="✓" if not error else "✗",
+                    downloaded=item_padded,
+                    percent=percent,
+                    total=self._stats.total,
+                    usage=usage,
+                    msg=msg,
+                ),
+                fg="red" if error else None,
+            )
         )
+        # errors are shown right away
+        if error or len(self._output) >= OUTPUT_BATCH_SIZE or monotonic() - self._output_flushed_at >= OUTPUT_FLUSH_SEC:
+            self._flush_output()
+
+    def _flush_output(self) -> None:
+        if self._output:
+            click.echo("\n".join(self._output))
+            self._output.clear()
+        self._output_flushed_at = monotonic()
 
     def download_or_wait(
         self,
@@ -310,26 +590,60 @@ class Downloader:
         download_list: Union[DownloadContentVersionList, DownloadAttachmentList],
     ) -> DownloadStats:
         self._stats.initialize(total=len(download_list))
+        self._dir_listing.clear()
+        skipped = 0
+        pending = threading.BoundedSemaphore(self._max_workers * PENDING_TASKS_PER_WORKER)
         try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
                 for download_obj, download_path in download_list:
-                    executor.submit(
+                    # skip files that are already in place, download lists never repeat a path
+                    if self._is_downloaded_into(
+                        downloaded_list=downloaded_list, download_obj=download_obj, download_path=download_path
+                    ):
+                        skipped += 1
+                        with self._lock:
+                            self._stats.add_processed(size=download_obj.content_size)
+                        continue
+                    pending.acquire()
+                    future = executor.submit(
                         self.download_or_wait,
                         downloaded_list=downloaded_list,
                         download_obj=download_obj,
                         download_path=download_path,
                     )
+                    future.add_done_callback(lambda _: pending.release())
         except KeyboardInterrupt as e:
             self._stop_event.set()
             executor.shutdown(wait=True, cancel_futures=True)
             raise e
+        finally:
+            with self._lock:
+                self._flush_output()
+        if skipped:
+            self._print_download_msg(msg="[OK] Skipped {count} already downloaded objects".format(count=skipped))
+            self._flush_output()
         return self._stats
 
+    def _is_downloaded_into(
+        self,
+        downloaded_list: DownloadedList,
+        download_obj: Union[ContentVersion, Attachment],
+        download_path: str,
+    ) -> bool:
+        downloaded_file = downloaded_list.get(download_obj)
+        return (
+            downloaded_file is not None
+            and downloaded_file.path == download_path
+            and self._dir_listing.find(download_path) is not None
+        )
+
     def _wait_if_api_usage_limit(self) -> None:
         if self._max_api_usage_percent is not None:
             usage = self._client.get_api_usage()
             while usage.percent >= self._max_api_usage_percent:
-                self._print_download_msg(msg="[NOTICE] Waiting for API limit to drop.")
+                with self._lock:
+                    self._print_download_msg(msg="[NOTICE] Waiting for API limit to drop.")
+                    self._flush_output()
                 for counter in range(self._wait_sec):
                     # check every second if stop signal was received, and if so,
                     # raise exception to stop current download
@@ -0,0 +1,2 @@
+# characters not allowed in file names, str.translate replaces them without running regex engine
+FILENAME_TRANSLATION = str.maketrans(dict.fromkeys('/\\?%*:|"<>', "-"))
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import concurrent.futures
 import csv
 import glob
 import os.path
-from math import ceil
-from typing import TYPE_CHECKING, Union
+import threading
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, Union
 
 from salesforce_archivist.salesforce.api import SalesforceApiClient
 from salesforce_archivist.salesforce.attachment import AttachmentList, Attachment
@@ -26,6 +28,9 @@ from salesforce_archivist.salesforce.validation import (
 if TYPE_CHECKING:
     from salesforce_archivist.archivist import ArchivistObject
 
+# Bulk API jobs for content version list batches that run at once
+BULK_MAX_WORKERS = 5
+
 
 class Salesforce:
     def __init__(
@@ -39,9 +44,10 @@ class Salesforce:
         self._client = client
         self._max_api_usage_percent = max_api_usage_percent
         self._dir_name_field = dir_name_field
+        self._lock = threading.Lock()
 
-    def _init_tmp_dir(self) -> str:
-        tmp_dir = os.path.join(self._archivist_obj.obj_dir, "tmp")
+    def _init_tmp_dir(self, name: str = "tmp") -> str:
+        tmp_dir = os.path.join(self._archivist_obj.obj_dir, name)
         os.makedirs(tmp_dir, exist_ok=True)
         for entry in os.scandir(tmp_dir):
             if entry.is_file():
@@ -123,41 +129,62 @@ class Salesforce:
         self,
         document_link_list: ContentDocumentLinkList,
         batch_size: int = 3000,
+        max_workers: int = BULK_MAX_WORKERS,
     ) -> ContentVersionList:
         content_version_list = ContentVersionList(data_dir=self._archivist_obj.obj_dir)
         if not content_version_list.data_file_exist():
-            doc_id_list = [link.content_document_id for link in document_link_list]
-            list_size = len(doc_id_list)
-            all_batches = ceil(list_size / batch_size)
-
-            for batch in range(1, all_batches + 1):
-                start = (batch - 1) * batch_size
-                end = start + batch_size
-                doc_id_batch = doc_id_list[start:end]
-                self.download_content_version_list(
-                    document_ids=doc_id_batch,
-                    content_version_list=content_version_list,
-                )
+            # Bulk API jobs spend most of the time waiting for Salesforce, so run few of them at once.
+            # Each batch gets its own tmp dir to not mix up result files.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = []
+                doc_ids = self._unique_document_ids(document_link_list)
+                for batch, doc_id_batch in enumerate(self._batched(doc_ids, batch_size), start=1):
+                    futures.append(
+                        executor.submit(
+                            self.download_content_version_list,
+                            document_ids=doc_id_batch,
+                            content_version_list=content_version_list,
+                            tmp_dir_name=os.path.join("tmp", str(batch)),
+                        )
+                    )
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
             content_version_list.save()
         else:
             content_version_list.load_data_from_file()
 
         return content_version_list
 
+    @staticmethod
+    def _unique_document_ids(document_link_list: Iterable[ContentDocumentLink]) -> Iterator[str]:
+        # one document can be linked to many entities, query it only once
+        seen: set[str] = set()
+        for link in document_link_list:
+            if link.content_document_id not in seen:
+                seen.add(link.content_document_id)
+                yield link.content_document_id
+
+    @staticmethod
+    def _batched(items: Iterable[str], batch_size: int) -> Iterator[list[str]]:
+        iterator = iter(items)
+        while batch := list(islice(iterator, batch_size)):
+            yield batch
+
     def download_content_version_list(
         self,
         document_ids: list[str],
         content_version_list: ContentVersionList,
         max_records: int = 50000,
+        tmp_dir_name: str = "tmp",
     ) -> None:
-        tmp_dir = self._init_tmp_dir()
+        tmp_dir = self._init_tmp_dir(name=tmp_dir_name)
         query = (
             "SELECT Id, ContentDocumentId, Checksum, Title, FileExtension, VersionNumber, ContentSize "
             "FROM ContentVersion WHERE ContentDocumentId IN ({id_list}) AND ContentSize > 1"
-        ).format(id_list=",".join(["'{id}'".format(id=doc_id) for doc_id in document_ids]))
+        ).format(id_list="'{ids}'".format(ids="','".join(document_ids)))
         self._client.bulk2(query=query, path=tmp_dir, max_records=max_records)
         for path in glob.glob(os.path.join(tmp_dir, "*.csv")):
-            with open(path) as file:
+            with open(path) as file, self._lock:
                 reader = csv.reader(file)
                 next(reader)
                 for row in reader:
@@ -247,11 +274,13 @@ class Salesforce:
         download_list: Union[DownloadContentVersionList, DownloadAttachmentList],
         validated_list: ValidatedList,
         max_workers: int | None = None,
+        downloaded_list: DownloadedList | None = None,
     ) -> ValidationStats:
         try:
             validator = DownloadValidator(
                 validated_list=validated_list,
                 max_workers=max_workers,
+                downloaded_list=downloaded_list,
             )
             return validator.validate(download_list=download_list)
         finally:
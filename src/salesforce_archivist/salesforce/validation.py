@@ -1,22 +1,70 @@
 import concurrent.futures
 import csv
 import hashlib
+import itertools
+import mmap
 import os
 import threading
-from typing import Any, Self, Union, Optional
+from time import monotonic
+from typing import Any, Iterable, Self, Union, Optional
 
 import click
 
 from salesforce_archivist.salesforce.attachment import Attachment
 from salesforce_archivist.salesforce.content_version import ContentVersion
-from salesforce_archivist.salesforce.download import DownloadContentVersionList, DownloadAttachmentList
+from salesforce_archivist.salesforce.download import (
+    DownloadContentVersionList,
+    DirectoryListing,
+    DownloadAttachmentList,
+    DownloadedList,
+    file_ends_with_newline,
+    OUTPUT_BATCH_SIZE,
+    OUTPUT_FLUSH_SEC,
+    PENDING_TASKS_PER_WORKER,
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_MMAP_MIN_SIZE = 10 * 1024 * 1024
+# hashlib releases GIL while hashing, so threads scale with CPU cores. Unlike ThreadPoolExecutor default,
+# do not cap number of workers at 32 on machines with many cores.
+DEFAULT_MAX_WORKERS = (os.cpu_count() or 1) + 4
+VALIDATED_LIST_HEADER = ["Checksum", "Content Size", "Path", "Modified Time"]
+
+
+_hash_buffers = threading.local()
+
+
+def _get_hash_buffer() -> memoryview:
+    # each worker thread reuses one read buffer, so hashing small files doesn't allocate 1 MiB per file
+    buffer: memoryview | None = getattr(_hash_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _hash_buffers.buffer = memoryview(bytearray(HASH_CHUNK_SIZE))
+    return buffer
+
+
+def _fadvise(fd: int, advice_name: str) -> None:
+    # posix_fadvise is only a hint and is not available on all platforms
+    if hasattr(os, "posix_fadvise") and hasattr(os, advice_name):
+        try:
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice_name))
+        except OSError:
+            pass
 
 
 class ValidatedFile:
-    def __init__(self, path: str, checksum: Optional[str] = None, content_size: Optional[int] = None):
+    __slots__ = ("_path", "_content_size", "_checksum", "_modified_time_ns")
+
+    def __init__(
+        self,
+        path: str,
+        checksum: Optional[str] = None,
+        content_size: Optional[int] = None,
+        modified_time_ns: Optional[int] = None,
+    ):
         self._path = path
         self._content_size = content_size
         self._checksum = checksum
+        self._modified_time_ns = modified_time_ns
         if self._checksum is None and self._content_size is None:
             raise ValueError("Either checksum or content_size must be provided")
 
@@ -32,6 +80,16 @@ class ValidatedFile:
     def checksum(self) -> Optional[str]:
         return self._checksum
 
+    @property
+    def modified_time_ns(self) -> Optional[int]:
+        return self._modified_time_ns
+
+    def matches_stat(self, file_stat: os.stat_result) -> bool:
+        # entries saved without modification time are trusted as before
+        if self._modified_time_ns is None:
+            return True
+        return (self._content_size, self._modified_time_ns) == (file_stat.st_size, file_stat.st_mtime_ns)
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, type(self)):
             return NotImplemented
@@ -39,38 +97,103 @@ class ValidatedFile:
 
 
 class ValidatedList:
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, checkpoint_size: int = 50):
         self._data: dict[str, ValidatedFile] = {}
         self._path = os.path.join(data_dir, "validated_files.csv")
+        self._checkpoint_size = checkpoint_size
+        self._unsaved: list[ValidatedFile] = []
+        # number of rows in data file, None when file was not loaded or written yet
+        self._file_rows: int | None = None
+        # file has outdated header or broken rows, so it is rewritten instead of appended to
+        self._rewrite_needed = False
+        self._lock = threading.Lock()
 
     def data_file_exist(self) -> bool:
         return os.path.exists(self._path)
 
     def load_data_from_file(self) -> None:
+        # Process killed while checkpoint is appended can leave the last row cut off. It is skipped together
+        # with rows that can't be parsed, and file is rewritten on next save, so no rows are appended to it.
+        complete = file_ends_with_newline(self._path)
         with open(self._path) as file:
             reader = csv.reader(file)
-            next(reader)
-            for row in reader:
-                checksum = row[0] if row[0] != "" else None
-                size = int(row[1]) if row[1] != "" else None
-                validated_file = ValidatedFile(path=row[2], checksum=checksum, content_size=size)
-                self.add(validated_file)
+            # files validated by older versions have no modified time column in header and rows
+            self._rewrite_needed = not complete or next(reader, None) != VALIDATED_LIST_HEADER
+            rows: Iterable[list[str]] = reader if complete else (row for row, _ in itertools.pairwise(reader))
+            file_rows = 0
+            for row in rows:
+                file_rows += 1
+                try:
+                    validated_file = ValidatedFile(
+                        path=row[2],
+                        checksum=row[0] if row[0] != "" else None,
+                        content_size=int(row[1]) if row[1] != "" else None,
+                        modified_time_ns=int(row[3]) if len(row) > 3 and row[3] != "" else None,
+                    )
+                except (IndexError, ValueError):
+                    self._rewrite_needed = True
+                    continue
+                self._data[validated_file.path] = validated_file
+        self._file_rows = file_rows
+
+    @staticmethod
+    def _to_row(validated_file: ValidatedFile) -> list[Any]:
+        return [
+            validated_file.checksum if validated_file.checksum is not None else "",
+            validated_file.content_size if validated_file.content_size is not None else "",
+            validated_file.path,
+            validated_file.modified_time_ns if validated_file.modified_time_ns is not None else "",
+        ]
 
     def save(self) -> None:
-        with open(self._path, "w") as file:
+        with self._lock:
+            # Only append new entries while file has no more than twice as many rows as there are entries,
+            # otherwise rewrite it to drop replaced entries.
+            if (
+                not self._rewrite_needed
+                and self._file_rows is not None
+                and self._file_rows + len(self._unsaved) <= 2 * len(self._data)
+            ):
+                self._save_checkpoint()
+                return
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        tmp_path = "{path}.tmp".format(path=self._path)
+        with open(tmp_path, "w") as file:
             writer = csv.writer(file)
-            writer.writerow(["Checksum", "Content Size", "Path"])
-            for _, validated_file in self._data.items():
-                writer.writerow(
-                    [
-                        validated_file.checksum if validated_file.checksum is not None else "",
-                        validated_file.content_size if validated_file.content_size is not None else "",
-                        validated_file.path,
-                    ]
-                )
+            writer.writerow(VALIDATED_LIST_HEADER)
+            writer.writerows(self._to_row(validated_file) for validated_file in self._data.values())
+        os.replace(tmp_path, self._path)
+        self._file_rows = len(self._data)
+        self._rewrite_needed = False
+        self._unsaved.clear()
+
+    def _save_checkpoint(self) -> None:
+        # Append only new entries so progress is not lost if process is killed. Entries added again
+        # are appended again and the last one wins on load, save() compacts the file when needed.
+        if self._rewrite_needed:
+            self._rewrite()
+            return
+        write_header = not os.path.exists(self._path)
+        with open(self._path, "a") as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(VALIDATED_LIST_HEADER)
+                self._file_rows = 0
+            writer.writerows(self._to_row(validated_file) for validated_file in self._unsaved)
+            file.flush()
+            os.fsync(file.fileno())
+        if self._file_rows is not None:
+            self._file_rows += len(self._unsaved)
+        self._unsaved.clear()
 
     def add(self, validated_file: ValidatedFile) -> None:
-        self._data[validated_file.path] = validated_file
+        with self._lock:
+            self._data[validated_file.path] = validated_file
+            self._unsaved.append(validated_file)
+            if len(self._unsaved) >= self._checkpoint_size:
+                self._save_checkpoint()
 
     def is_validated(self, path: str) -> bool:
         return path in self._data
@@ -122,57 +245,125 @@ class ValidationStats:
 
 
 class DownloadValidator:
-    def __init__(self, validated_list: ValidatedList, max_workers: int | None = None):
+    def __init__(
+        self,
+        validated_list: ValidatedList,
+        max_workers: int | None = None,
+        downloaded_list: DownloadedList | None = None,
+    ):
         self._validated_list = validated_list
+        self._downloaded_list = downloaded_list
         self._stats = ValidationStats()
         self._lock = threading.Lock()
-        self._max_workers = max_workers
+        self._max_workers = max_workers if max_workers is not None else DEFAULT_MAX_WORKERS
+        self._dir_listing = DirectoryListing()
+        self._output: list[str] = []
+        self._output_flushed_at = monotonic()
 
     def _print_validated_msg(self, msg: str, invalid: bool = False) -> None:
         percent = self._stats.processed / self._stats.total * 100 if self._stats.total > 0 else 0.0
         item_padded = "{{:{width}d}}".format(width=len(str(self._stats.total))).format(self._stats.processed)
-        click.secho(
-            "[{emoji} {checked}/{total} {percent:6.2f}%] {msg}".format(
-                emoji="✓" if not invalid else "✗",
-                checked=item_padded,
-                percent=percent,
-                total=self._stats.total,
-                msg=msg,
-            ),
-            fg="red" if invalid else None,
+        self._output.append(
+            click.style(
+                "[{emoji} {checked}/{total} {percent:6.2f}%] {msg}".format(
+                    emoji="✓" if not invalid else "✗",
+                    checked=item_padded,
+                    percent=percent,
+                    total=self._stats.total,
+                    msg=msg,
+                ),
+                fg="red" if invalid else None,
+            )
         )
+        # errors are shown right away
+        if (
+            invalid
+            or len(self._output) >= OUTPUT_BATCH_SIZE
+            or monotonic() - self._output_flushed_at >= OUTPUT_FLUSH_SEC
+        ):
+            self._flush_output()
+
+    def _flush_output(self) -> None:
+        if self._output:
+            click.echo("\n".join(self._output))
+            self._output.clear()
+        self._output_flushed_at = monotonic()
 
     @staticmethod
-    def _calculate_size(path: str) -> int:
-        return os.path.getsize(path)
+    def _validated_file(path: str, file_stat: os.stat_result, checksum: str | None = None) -> ValidatedFile:
+        return ValidatedFile(
+            path=path, checksum=checksum, content_size=file_stat.st_size, modified_time_ns=file_stat.st_mtime_ns
+        )
 
     @staticmethod
     def _calculate_md5(path: str) -> str:
         hash_md5 = hashlib.md5()
-        with open(path, "rb") as f:
-            while chunk := f.read(4096):
-                hash_md5.update(chunk)
+        # unbuffered file, data is read straight into hash buffer without copying it through BufferedReader
+        with open(path, "rb", buffering=0) as f:
+            mapped_file = None
+            # mapping costs more than it saves for small files, so only big ones are memory mapped
+            if os.fstat(f.fileno()).st_size >= HASH_MMAP_MIN_SIZE:
+                try:
+                    mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # some file systems can't be memory mapped, read file using buffer instead
+                    pass
+            if mapped_file is None:
+                # file is read once from start to end, let kernel read ahead more aggressively
+                _fadvise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+                buffer_view = _get_hash_buffer()
+                while size := f.readinto(buffer_view):
+                    hash_md5.update(buffer_view[:size])
+            else:
+                with mapped_file, memoryview(mapped_file) as view:
+                    if hasattr(mapped_file, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                        # file is read once from start to end, let kernel read ahead and drop pages behind
+                        mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+                    for offset in range(0, len(view), HASH_CHUNK_SIZE):
+                        hash_md5.update(view[offset : offset + HASH_CHUNK_SIZE])
+            # file won't be read again, don't let it push more useful data out of page cache
+            _fadvise(f.fileno(), "POSIX_FADV_DONTNEED")
         return hash_md5.hexdigest()
 
+    def _downloaded_checksum(self, version: ContentVersion, path: str, file_stat: os.stat_result) -> str | None:
+        # checksum calculated while downloading is valid as long as file was not changed since then
+        if self._downloaded_list is None:
+            return None
+        downloaded = self._downloaded_list.get(version)
+        if downloaded is None or downloaded.path != path or not downloaded.matches_stat(file_stat):
+            return None
+        return downloaded.checksum
+
     def _validate_version(self, version: ContentVersion, download_path: str) -> bool:
         valid = True
         msg = "[ OK ] {id} => {path}".format(id=version.id, path=download_path)
         try:
-            if not os.path.exists(download_path):
-                msg = "[ KO ] {id} => File does not exist: {path}".format(id=version.id, path=download_path)
-                valid = False
-            elif (validated := self._validated_list.get(download_path)) is not None:
+            file_stat = os.stat(download_path)
+            validated = self._validated_list.get(download_path)
+            # reuse checksum from previous run as long as file was not changed since then
+            if validated is not None and validated.checksum is not None and validated.matches_stat(file_stat):
                 if version.checksum != validated.checksum:
                     msg = "[ KO ] {id} => checksum invalid: {path}".format(id=version.id, path=download_path)
                     valid = False
+            # Size check is a cheap fingerprint that catches truncated or partial downloads without hashing.
+            # Salesforce provides only MD5 checksums, so MD5 is still needed to validate matching files.
+            elif version.content_size != file_stat.st_size:
+                msg = "[ KO ] {id} => size invalid: {path}".format(id=version.id, path=download_path)
+                valid = False
+                self._validated_list.add(self._validated_file(path=download_path, file_stat=file_stat))
             else:
-                checksum = self._calculate_md5(download_path)
+                checksum = self._downloaded_checksum(version, download_path, file_stat)
+                if checksum is None:
+                    checksum = self._calculate_md5(download_path)
                 if version.checksum != checksum:
                     msg = "[ KO ] {id} => checksum invalid: {path}".format(id=version.id, path=download_path)
                     valid = False
                 self._validated_list.add(
-                    ValidatedFile(path=download_path, checksum=checksum, content_size=version.content_size)
+                    self._validated_file(path=download_path, file_stat=file_stat, checksum=checksum)
                 )
+        except FileNotFoundError:
+            msg = "[ KO ] {id} => File does not exist: {path}".format(id=version.id, path=download_path)
+            valid = False
         except Exception as e:
             msg = "[ KO ] {id} => Exception: {e}".format(id=version.id, e=e)
             valid = False
@@ -187,21 +378,14 @@ class DownloadValidator:
         valid = True
         msg = "[ OK ] {id} => {path}".format(id=attachment.id, path=download_path)
         try:
-            if not os.path.exists(download_path):
-                msg = "[ KO ] {id} => File does not exist: {path}".format(id=attachment.id, path=download_path)
+            file_stat = os.stat(download_path)
+            if attachment.content_size != file_stat.st_size:
+                msg = "[ KO ] {id} => size invalid: {path}".format(id=attachment.id, path=download_path)
                 valid = False
-            elif (validated := self._validated_list.get(download_path)) is not None:
-                if attachment.content_size != validated.content_size:
-                    msg = "[ KO ] {id} => size invalid: {path}".format(id=attachment.id, path=download_path)
-                    valid = False
-            else:
-                size = self._calculate_size(download_path)
-                if attachment.content_size != size:
-                    msg = "[ KO ] {id} => size invalid: {path}".format(id=attachment.id, path=download_path)
-                    valid = False
-                self._validated_list.add(
-                    ValidatedFile(path=download_path, checksum=None, content_size=attachment.content_size)
-                )
+            self._validated_list.add(self._validated_file(path=download_path, file_stat=file_stat))
+        except FileNotFoundError:
+            msg = "[ KO ] {id} => File does not exist: {path}".format(id=attachment.id, path=download_path)
+            valid = False
         except Exception as e:
             msg = "[ KO ] {id} => Exception: {e}".format(id=attachment.id, e=e)
             valid = False
@@ -225,12 +409,45 @@ class DownloadValidator:
 
     def validate(self, download_list: Union[DownloadContentVersionList, DownloadAttachmentList]) -> ValidationStats:
         self._stats.initialize(total=len(download_list))
+        self._dir_listing.clear()
+        skipped = 0
+        pending = threading.BoundedSemaphore(self._max_workers * PENDING_TASKS_PER_WORKER)
         try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
                 for obj, download_path in download_list:
-                    executor.submit(self.validate_object, obj=obj, download_path=download_path)
+                    # skip files with matching validation result from previous runs, download lists never repeat a path
+                    if self._is_validated(obj=obj, download_path=download_path):
+                        skipped += 1
+                        with self._lock:
+                            self._stats.add_processed()
+                        continue
+                    pending.acquire()
+                    future = executor.submit(self.validate_object, obj=obj, download_path=download_path)
+                    future.add_done_callback(lambda _: pending.release())
         except KeyboardInterrupt as e:
             executor.shutdown(wait=True, cancel_futures=True)
             raise e
 
+        finally:
+            with self._lock:
+                self._flush_output()
+
+        if skipped:
+            self._print_validated_msg("[ OK ] Skipped {count} already validated files".format(count=skipped))
+            self._flush_output()
         return self._stats
+
+    def _is_validated(self, obj: Union[ContentVersion, Attachment], download_path: str) -> bool:
+        validated = self._validated_list.get(download_path)
+        if validated is None:
+            return False
+        if isinstance(obj, ContentVersion):
+            matches = obj.checksum == validated.checksum
+        elif isinstance(obj, Attachment):
+            matches = obj.content_size == validated.content_size
+        else:
+            return False
+        if not matches or (entry := self._dir_listing.find(download_path)) is None:
+            return False
+        # stat only files with modification time saved, to check they were not changed since validation
+        return validated.modified_time_ns is None or validated.matches_stat(entry.stat())
@@ -1,15 +1,17 @@
+import socket
 from unittest.mock import Mock, call
 
 import pytest
+import requests
 from requests import Response
 from simple_salesforce.api import Usage
 
-from salesforce_archivist.salesforce.api import ApiUsage, SalesforceApiClient
+from salesforce_archivist.salesforce.api import ApiUsage, SalesforceApiClient, CONNECT_RETRIES
 from salesforce_archivist.salesforce.attachment import Attachment
 from salesforce_archivist.salesforce.content_version import ContentVersion
 
 
-@pytest.mark.parametrize("used, total, percent", [(15, 100, 15.0), (999, 1000, 99.9), (97, 501, 19.36)])
+@pytest.mark.parametrize("used, total, percent", [(15, 100, 15.0), (999, 1000, 99.9), (97, 501, 19.36), (0, 0, 0.0)])
 def test_api_usage(used: int, total: int, percent: float):
     sf_usage = Usage(used=used, total=total)
     api_usage = ApiUsage(sf_usage)
@@ -18,6 +20,65 @@ def test_api_usage(used: int, total: int, percent: float):
     assert api_usage.percent == percent
 
 
+def test_configure_connection_pool():
+    mock_sf = Mock()
+    client = SalesforceApiClient(sf_client=mock_sf)
+    client.configure_connection_pool(pool_size=20)
+    mock_sf.session.mount.assert_called_once()
+    prefix, adapter = mock_sf.session.mount.call_args.args
+    assert prefix == "https://"
+    assert adapter._pool_maxsize == 20
+    assert adapter.max_retries.connect == CONNECT_RETRIES
+    assert adapter.max_retries.read is False
+
+
+def test_connection_pool_adapter_will_raise_read_timeout():
+    mock_sf = Mock()
+    client = SalesforceApiClient(sf_client=mock_sf)
+    client.configure_connection_pool(pool_size=1)
+    _, adapter = mock_sf.session.mount.call_args.args
+    # server accepts connection (in backlog) but never responds
+    with socket.create_server(("127.0.0.1", 0)) as server, requests.Session() as session:
+        session.mount("http://", adapter)
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get("http://127.0.0.1:{port}/".format(port=server.getsockname()[1]), timeout=0.2)
+
+
+def test_client_factory_will_be_called_on_first_api_call():
+    mock_sf = Mock()
+    mock_sf.bulk2.Account.download.return_value = []
+    factory = Mock(return_value=mock_sf)
+    client = SalesforceApiClient(sf_client_factory=factory)
+    client.configure_connection_pool(pool_size=20)
+    factory.assert_not_called()
+    client.bulk2("query", "path", 1)
+    client.bulk2("query", "path", 1)
+    factory.assert_called_once()
+    prefix, adapter = mock_sf.session.mount.call_args.args
+    assert prefix == "https://"
+    assert adapter._pool_maxsize == 20
+
+
+def test_get_reported_api_usage_will_not_call_salesforce():
+    factory = Mock()
+    client = SalesforceApiClient(sf_client_factory=factory)
+    assert client.get_reported_api_usage() is None
+    factory.assert_not_called()
+
+    mock_sf = Mock()
+    mock_sf.api_usage = {}
+    client = SalesforceApiClient(sf_client=mock_sf)
+    assert client.get_reported_api_usage() is None
+    mock_sf.api_usage = {"api-usage": Usage(used=5, total=10)}
+    assert client.get_reported_api_usage().percent == 50.0
+    mock_sf.limits.assert_not_called()
+
+
+def test_client_or_factory_is_required():
+    with pytest.raises(ValueError):
+        SalesforceApiClient()
+
+
 def test_bulk2():
     expected_result = [{"test": 1}]
     mock_sf = Mock()
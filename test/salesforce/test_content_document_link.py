@@ -25,6 +25,13 @@ def test_content_document_link_equality():
     assert link1 == link2
 
 
+def test_content_document_link_will_share_id_strings():
+    link_1 = ContentDocumentLink(linked_entity_id="".join(["LID", "1"]), content_document_id="".join(["DID", "1"]))
+    link_2 = ContentDocumentLink(linked_entity_id="".join(["LID", "1"]), content_document_id="".join(["DID", "1"]))
+    assert link_1.linked_entity_id is link_2.linked_entity_id
+    assert link_1.content_document_id is link_2.content_document_id
+
+
 @patch("os.path.exists")
 def test_content_document_link_list_data_file_exist(exists_mock):
     exists_mock.side_effect = [True, False]
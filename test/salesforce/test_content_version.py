@@ -42,6 +42,21 @@ def test_content_version_properties():
         extension=ext,
         version_number=version_number,
     )
+    assert not hasattr(version, "__dict__")
+
+
+def test_content_version_filename_is_built_once():
+    version = ContentVersion(
+        version_id="ID",
+        document_id="DOC_ID",
+        title="a/b",
+        extension="txt",
+        checksum="CHECKSUM",
+        version_number=1,
+        content_size=10,
+    )
+    assert version.filename is version.filename
+    assert version.filename == "DOC_ID_1_ID_a-b.txt"
 
 
 def test_content_version_equality():
@@ -232,6 +247,26 @@ def test_content_version_list_get_content_versions_for_link():
         next(gen)
 
 
+def test_content_version_list_count_content_versions_for_link():
+    version_list = ContentVersionList(data_dir="/fake/dir")
+    for version_number in [1, 2]:
+        version_list.add_version(
+            version=ContentVersion(
+                version_id="id{}".format(version_number),
+                document_id="did1",
+                checksum="sum",
+                title="title",
+                extension="ext",
+                version_number=version_number,
+                content_size=10,
+            )
+        )
+    link = ContentDocumentLink(content_document_id="did1", linked_entity_id="LID1")
+    assert version_list.count_content_versions_for_link(link=link) == 2
+    link = ContentDocumentLink(content_document_id="did2", linked_entity_id="LID1")
+    assert version_list.count_content_versions_for_link(link=link) == 0
+
+
 def test_content_version_list_len():
     version_list = ContentVersionList(data_dir="/fake/dir")
     version1 = ContentVersion(
@@ -1,4 +1,6 @@
 import concurrent.futures
+import hashlib
+import io
 import os
 import tempfile
 from unittest.mock import patch, call, Mock, MagicMock
@@ -6,22 +8,43 @@ from unittest.mock import patch, call, Mock, MagicMock
 import pytest
 from simple_salesforce.api import Usage
 
-from salesforce_archivist.salesforce.api import ApiUsage
+from salesforce_archivist.salesforce.api import ApiUsage, SalesforceApiClient
 from salesforce_archivist.salesforce.attachment import Attachment, AttachmentList
-from test.salesforce.helper import gen_csv
 from salesforce_archivist.archivist import ArchivistObject
 from salesforce_archivist.salesforce.content_document_link import ContentDocumentLinkList, ContentDocumentLink
 from salesforce_archivist.salesforce.content_version import ContentVersion, ContentVersionList
 from salesforce_archivist.salesforce.download import (
+    DirectoryListing,
     DownloadedSalesforceObject,
     DownloadedList,
     DownloadContentVersionList,
     Downloader,
     DownloadStats,
     DownloadAttachmentList,
+    DEFAULT_MAX_WORKERS,
+    DOWNLOADED_LIST_HEADER,
+    OUTPUT_FLUSH_SEC,
+    AdaptiveConcurrency,
 )
 
 
+def test_directory_listing_find(tmp_path):
+    (tmp_path / "file.txt").write_bytes(b"test")
+    (tmp_path / "dir").mkdir()
+    listing = DirectoryListing()
+    with patch("os.scandir", wraps=os.scandir) as scandir_mock:
+        assert listing.find(str(tmp_path / "file.txt")).name == "file.txt"
+        assert listing.find(str(tmp_path / "other.txt")) is None
+        assert listing.find(str(tmp_path / "dir")) is None
+        assert listing.find(str(tmp_path / "missing" / "file.txt")) is None
+        assert scandir_mock.call_count == 2
+    # listing is a snapshot until cleared
+    (tmp_path / "other.txt").write_bytes(b"test")
+    assert listing.find(str(tmp_path / "other.txt")) is None
+    listing.clear()
+    assert listing.find(str(tmp_path / "other.txt")) is not None
+
+
 def test_downloaded_salesforce_object_props():
     obj_id, path = ("ID", "/path/to/file.txt")
     downloaded_ver = DownloadedSalesforceObject(obj_id=obj_id, path=path)
@@ -46,34 +69,64 @@ def test_downloaded_list_data_file_exist(exists_mock):
 
 
 @pytest.mark.parametrize(
-    "csv_data",
+    "csv_text, expected",
     [
-        [
-            [
-                ["Id", "Path on disk"],
-            ],
-        ],
-        [
-            [
-                ["Id", "Path on disk"],
-                ["Id_1", "data/path/file_1.txt"],
-                ["Id_2", "data/path/file_2.txt"],
-            ],
-        ],
+        ("Id,Path on disk\n", {}),
+        (
+            # legacy file without checksum columns, last row cut off when process was killed
+            "Id,Path on disk\nId_1,data/path/file_1.txt\nId_2,data/path/file_2.txt\nId_3,data/pa",
+            {
+                "Id_1": ("data/path/file_1.txt", None, None, None),
+                "Id_2": ("data/path/file_2.txt", None, None, None),
+            },
+        ),
+        (
+            "Id,Path on disk,Checksum,Size,Modified Time\n"
+            "Id_1,data/path/file_1.txt,abc,4,5\n"
+            "Id_2,data/path/file_2.txt,,,\n"
+            "Id_1,data/path/file_3.txt,def,6,7\n"
+            "Id_4,data/path/file_4.txt,gh",
+            {
+                "Id_1": ("data/path/file_3.txt", "def", 6, 7),
+                "Id_2": ("data/path/file_2.txt", None, None, None),
+            },
+        ),
     ],
 )
-def test_downloaded_list_load_data_from_file(csv_data):
+def test_downloaded_list_load_data_from_file(csv_text, expected):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        download_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        with open(download_list.path, "w") as file:
+            file.write(csv_text)
+        download_list.load_data_from_file()
+        assert len(download_list) == len(expected)
+        for obj_id, (path, checksum, content_size, modified_time_ns) in expected.items():
+            loaded = download_list.get(obj=MagicMock(id=obj_id))
+            assert loaded.id == obj_id
+            assert (loaded.path, loaded.checksum, loaded.content_size, loaded.modified_time_ns) == (
+                path,
+                checksum,
+                content_size,
+                modified_time_ns,
+            )
+        assert download_list.get(obj=MagicMock(id="Id_3")) is None
+        assert download_list.get(obj=MagicMock(id="Id_4")) is None
+
+
+def test_downloaded_list_save_will_keep_checksum():
     with tempfile.TemporaryDirectory() as tmp_dir:
-        with patch.object(DownloadedList, "add") as add_version_mock:
-            download_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
-            gen_csv(data=csv_data, path=download_list.path)
-            download_list.load_data_from_file()
-            expected_calls = []
-            for i, row in enumerate(csv_data):
-                if not i:
-                    continue
-                expected_calls.append(call(version=DownloadedSalesforceObject(obj_id=row[0], path=row[1])))
-            assert add_version_mock.mock_calls == expected_calls
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        downloaded_list.add(
+            DownloadedSalesforceObject(obj_id="id1", path="path/1", checksum="abc", content_size=4, modified_time_ns=5)
+        )
+        downloaded_list.add(DownloadedSalesforceObject(obj_id="id2", path="path/2"))
+        downloaded_list.save()
+        loaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        loaded_list.load_data_from_file()
+        loaded = loaded_list.get(MagicMock(id="id1"))
+        assert (loaded.checksum, loaded.content_size, loaded.modified_time_ns) == ("abc", 4, 5)
+        loaded = loaded_list.get(MagicMock(id="id2"))
+        assert (loaded.checksum, loaded.content_size, loaded.modified_time_ns) == (None, None, None)
 
 
 def test_downloaded_list_save():
@@ -102,6 +155,74 @@ def test_downloaded_list_save():
             assert version == loaded_list.get(obj=cv)
 
 
+def test_downloaded_list_add_will_save_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv", checkpoint_size=2)
+        for i in range(3):
+            downloaded_list.add(obj=DownloadedSalesforceObject(obj_id="id{}".format(i), path="path/{}".format(i)))
+        checkpoint_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        checkpoint_list.load_data_from_file()
+        assert len(checkpoint_list) == 2
+        downloaded_list.save()
+        saved_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        saved_list.load_data_from_file()
+        assert len(saved_list) == 3
+
+
+def test_downloaded_list_save_will_append_or_compact():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        downloaded_list.add(obj=DownloadedSalesforceObject(obj_id="id1", path="path/1"))
+        downloaded_list.save()
+        loaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        loaded_list.load_data_from_file()
+        loaded_list.add(obj=DownloadedSalesforceObject(obj_id="id2", path="path/2"))
+        with patch("os.replace") as replace_mock:
+            loaded_list.save()
+            replace_mock.assert_not_called()
+        for i in range(3):
+            loaded_list.add(obj=DownloadedSalesforceObject(obj_id="id1", path="path/{}".format(i)))
+        loaded_list.save()
+        with open(loaded_list.path) as file:
+            assert len(file.readlines()) == 3
+        saved_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        saved_list.load_data_from_file()
+        attachment = Attachment(attachment_id="id1", parent_id="PID", content_size=1, name="name")
+        assert saved_list.get(obj=attachment).path == "path/2"
+
+
+def test_downloaded_list_load_will_skip_broken_rows_and_rewrite_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv", checkpoint_size=1)
+        with open(downloaded_list.path, "w") as file:
+            # last row was cut off when process was killed during checkpoint
+            file.write("Id,Path on disk,Checksum,Size,Modified Time\nid1,path/1,abc,4,5\nid2\nid3,path/3,d,x,1\nid4,pa")
+        downloaded_list.load_data_from_file()
+        assert len(downloaded_list) == 1
+        downloaded_list.add(obj=DownloadedSalesforceObject(obj_id="id5", path="path/5"))
+        with open(downloaded_list.path) as file:
+            assert file.read().splitlines() == [
+                ",".join(DOWNLOADED_LIST_HEADER),
+                "id1,path/1,abc,4,5",
+                "id5,path/5,,,",
+            ]
+
+
+def test_downloaded_list_will_upgrade_legacy_header():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv", checkpoint_size=1)
+        with open(downloaded_list.path, "w") as file:
+            file.write("Id,Path on disk\nid1,path/1\n")
+        downloaded_list.load_data_from_file()
+        downloaded_list.add(
+            obj=DownloadedSalesforceObject(
+                obj_id="id2", path="path/2", checksum="c", content_size=1, modified_time_ns=2
+            )
+        )
+        with open(downloaded_list.path) as file:
+            assert file.read().splitlines() == [",".join(DOWNLOADED_LIST_HEADER), "id1,path/1,,,", "id2,path/2,c,1,2"]
+
+
 def test_downloaded_list_add_get():
     downloaded_list = DownloadedList(data_dir="/fake/dir", file_name="downloaded_versions.csv")
     downloaded_sf_object = DownloadedSalesforceObject(obj_id="id1", path="path/file.txt")
@@ -156,10 +277,11 @@ def test_downloaded_list_is_downloaded():
     assert downloaded_list.is_downloaded(attachment)
 
 
-def test_download_content_version_list():
+@pytest.mark.parametrize("download_dir_name", [None, "", "Dir Name"])
+def test_download_content_version_list(download_dir_name):
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
     link_list = ContentDocumentLinkList(data_dir=archivist_obj.obj_dir)
-    link = ContentDocumentLink(linked_entity_id="LID", content_document_id="DOC1")
+    link = ContentDocumentLink(linked_entity_id="LID", content_document_id="DOC1", download_dir_name=download_dir_name)
     link_list.add_link(doc_link=link)
     version_list = ContentVersionList(data_dir=archivist_obj.obj_dir)
     version = ContentVersion(
@@ -175,6 +297,7 @@ def test_download_content_version_list():
     download = DownloadContentVersionList(
         document_link_list=link_list, content_version_list=version_list, data_dir=archivist_obj.obj_dir
     )
+    assert len(download) == 1
     generator = download.__iter__()
     assert next(generator) == (
         version,
@@ -184,12 +307,47 @@ def test_download_content_version_list():
         next(generator)
 
 
+def test_download_content_version_list_will_list_shared_directory_once():
+    archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
+    link_list = ContentDocumentLinkList(data_dir=archivist_obj.obj_dir)
+    link_list.add_link(ContentDocumentLink(linked_entity_id="LID1", content_document_id="DOC1", download_dir_name="D"))
+    link_list.add_link(ContentDocumentLink(linked_entity_id="LID2", content_document_id="DOC2", download_dir_name="E"))
+    link_list.add_link(ContentDocumentLink(linked_entity_id="LID3", content_document_id="DOC1", download_dir_name="D"))
+    link_list.add_link(ContentDocumentLink(linked_entity_id="LID3", content_document_id="DOC2", download_dir_name="D"))
+    version_list = ContentVersionList(data_dir=archivist_obj.obj_dir)
+    versions = [
+        ContentVersion(
+            version_id="VID{}".format(i),
+            document_id=document_id,
+            checksum="c",
+            extension="ext",
+            title="version",
+            version_number=1,
+            content_size=10,
+        )
+        for i, document_id in enumerate(["DOC1", "DOC2"])
+    ]
+    for version in versions:
+        version_list.add_version(version=version)
+    download = DownloadContentVersionList(
+        document_link_list=link_list, content_version_list=version_list, data_dir=archivist_obj.obj_dir
+    )
+    files_dir = os.path.join(archivist_obj.obj_dir, "files")
+    assert list(download) == [
+        (versions[0], os.path.join(files_dir, "D", versions[0].filename)),
+        (versions[1], os.path.join(files_dir, "D", versions[1].filename)),
+        (versions[1], os.path.join(files_dir, "E", versions[1].filename)),
+    ]
+    assert len(download) == 3
+
+
 def test_download_attachment_list():
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="Attachment")
     attachment = Attachment(attachment_id="ID", parent_id="PID", content_size=10, name="Name")
     attachment_list = AttachmentList(data_dir=archivist_obj.obj_dir)
     attachment_list.add_attachment(attachment=attachment)
     download = DownloadAttachmentList(attachment_list=attachment_list, data_dir=archivist_obj.obj_dir)
+    assert len(download) == 1
     generator = download.__iter__()
     assert next(generator) == (
         attachment,
@@ -240,6 +398,76 @@ def test_downloader_download_will_download_in_parallel(submit_mock):
     assert submit_mock.call_count == 2
 
 
+@patch.object(concurrent.futures.ThreadPoolExecutor, "submit")
+def test_downloader_download_will_skip_downloaded_objects(submit_mock):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        version_1 = ContentVersion(
+            version_id="VID1",
+            document_id="DOC1",
+            checksum="c1",
+            extension="ext1",
+            title="version1",
+            version_number=1,
+            content_size=10,
+        )
+        version_2 = ContentVersion(
+            version_id="VID2",
+            document_id="DOC2",
+            checksum="c2",
+            extension="ext2",
+            title="version2",
+            version_number=1,
+            content_size=10,
+        )
+        downloaded_path = os.path.join(tmp_dir, "file1.txt")
+        with open(downloaded_path, "wb") as file:
+            file.write(b"test")
+        to_download_path = os.path.join(tmp_dir, "file2.txt")
+        download_list = MagicMock()
+        download_list.__len__.return_value = 2
+        download_list.__iter__.return_value = [
+            (version_1, downloaded_path),
+            (version_2, to_download_path),
+        ]
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        downloaded_list.add(DownloadedSalesforceObject(obj_id=version_1.id, path=downloaded_path))
+        sf_client = Mock()
+        sf_client.get_reported_api_usage.return_value = ApiUsage(Usage(used=10, total=100))
+        downloader = Downloader(sf_client=sf_client)
+        stats = downloader.download(downloaded_list=downloaded_list, download_list=download_list)
+        assert submit_mock.call_count == 1
+        assert stats.processed == 1
+
+
+def test_downloader_download_will_not_create_client_when_all_objects_are_downloaded(capsys):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        version = ContentVersion(
+            version_id="VID1",
+            document_id="DOC1",
+            checksum="c1",
+            extension="ext1",
+            title="version1",
+            version_number=1,
+            content_size=10,
+        )
+        downloaded_path = os.path.join(tmp_dir, "file1.txt")
+        with open(downloaded_path, "wb") as file:
+            file.write(b"test")
+        download_list = MagicMock()
+        download_list.__len__.return_value = 1
+        download_list.__iter__.return_value = [(version, downloaded_path)]
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_versions.csv")
+        downloaded_list.add(DownloadedSalesforceObject(obj_id=version.id, path=downloaded_path))
+        sf_client_factory = Mock()
+        downloader = Downloader(
+            sf_client=SalesforceApiClient(sf_client_factory=sf_client_factory), max_api_usage_percent=50
+        )
+        stats = downloader.download(downloaded_list=downloaded_list, download_list=download_list)
+        assert stats.processed == 1
+        assert sf_client_factory.call_count == 0
+        assert "[☁️  -.--%] [OK] Skipped 1 already downloaded objects" in capsys.readouterr().out
+
+
 @patch("concurrent.futures.ThreadPoolExecutor")
 def test_downloader_download_will_use_defined_workers(thread_pool_mock):
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
@@ -424,7 +652,7 @@ def test_downloader_download_file_from_sf_will_download_version_from_salesforce(
         downloaded_list = DownloadedList(data_dir=archivist_obj.obj_dir, file_name="downloaded_versions.csv")
 
         sf_client = MagicMock()
-        sf_client.download_content_version.return_value.iter_content.return_value = [b"test"]
+        sf_client.download_content_version.return_value.raw = io.BytesIO(b"test")
         download_list_mock = MagicMock()
         download_list_mock.return_value.__iter__.return_value = []
         downloader = Downloader(
@@ -439,6 +667,45 @@ def test_downloader_download_file_from_sf_will_download_version_from_salesforce(
         assert os.path.exists(path)
         with open(path, "rb") as file:
             assert file.read() == b"test"
+        downloaded = downloaded_list.get(obj)
+        assert downloaded.checksum == hashlib.md5(b"test").hexdigest()
+        assert downloaded.content_size == 4
+        assert downloaded.modified_time_ns == os.stat(path).st_mtime_ns
+
+
+@patch.object(AdaptiveConcurrency, "release")
+def test_downloader_download_file_from_sf_will_release_with_reported_api_usage(release_mock):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_attachments.csv")
+        sf_client = MagicMock()
+        sf_client.download_attachment.side_effect = Exception("download failed")
+        sf_client.get_reported_api_usage.return_value = ApiUsage(Usage(used=30, total=100))
+        downloader = Downloader(sf_client=sf_client, max_api_usage_percent=50)
+        with pytest.raises(Exception, match="download failed"):
+            downloader.download_file_from_sf(
+                download_obj=Attachment(attachment_id="ID", parent_id="PID", content_size=4, name="N"),
+                download_path=os.path.join(tmp_dir, "files", "PID", "ID"),
+                downloaded_list=downloaded_list,
+            )
+        release_mock.assert_called_once_with(size=4, api_usage_percent=30.0)
+        sf_client.get_api_usage.assert_not_called()
+
+
+def test_downloader_download_file_from_sf_will_create_directory_once():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloaded_list = DownloadedList(data_dir=tmp_dir, file_name="downloaded_attachments.csv")
+        sf_client = MagicMock()
+        sf_client.download_attachment.side_effect = lambda attachment: MagicMock(raw=io.BytesIO(b"test"))
+        downloader = Downloader(sf_client=sf_client)
+        with patch("os.makedirs", wraps=os.makedirs) as makedirs_mock:
+            for attachment_id in ["ID1", "ID2"]:
+                downloader.download_file_from_sf(
+                    download_obj=Attachment(attachment_id=attachment_id, parent_id="PID", content_size=4, name="N"),
+                    download_path=os.path.join(tmp_dir, "files", "PID", attachment_id),
+                    downloaded_list=downloaded_list,
+                )
+        assert makedirs_mock.call_args_list.count(call(os.path.join(tmp_dir, "files", "PID"), exist_ok=True)) == 1
+        assert os.path.exists(os.path.join(tmp_dir, "files", "PID", "ID2"))
 
 
 def test_downloader_download_file_from_sf_will_download_attachment_from_salesforce():
@@ -453,7 +720,7 @@ def test_downloader_download_file_from_sf_will_download_attachment_from_salesfor
         downloaded_list = DownloadedList(data_dir=archivist_obj.obj_dir, file_name="downloaded_versions.csv")
 
         sf_client = MagicMock()
-        sf_client.download_attachment.return_value.iter_content.return_value = [b"test"]
+        sf_client.download_attachment.return_value.raw = io.BytesIO(b"test")
         download_list_mock = MagicMock()
         download_list_mock.return_value.__iter__.return_value = []
         downloader = Downloader(
@@ -470,6 +737,38 @@ def test_downloader_download_file_from_sf_will_download_attachment_from_salesfor
             assert file.read() == b"test"
 
 
+@patch("salesforce_archivist.salesforce.download.monotonic", return_value=0.0)
+def test_downloader_will_print_messages_in_batches(monotonic_mock, capsys):
+    sf_client = MagicMock()
+    sf_client.get_reported_api_usage.return_value = ApiUsage(Usage(used=50, total=100))
+    downloader = Downloader(sf_client=sf_client)
+    downloader._print_download_msg("[OK] first")
+    assert capsys.readouterr().out == ""
+    downloader._print_download_msg("[ERROR] second", error=True)
+    output = capsys.readouterr().out.splitlines()
+    assert len(output) == 2
+    assert output[0].endswith("[OK] first")
+    assert output[1].endswith("[ERROR] second")
+    downloader._print_download_msg("[OK] third")
+    assert capsys.readouterr().out == ""
+    monotonic_mock.return_value = OUTPUT_FLUSH_SEC
+    downloader._print_download_msg("[OK] fourth")
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+def test_downloader_download_will_flush_messages(capsys):
+    downloaded_list = DownloadedList(data_dir="/fake/dir", file_name="downloaded_versions.csv")
+    download_list = MagicMock()
+    download_list.__len__.return_value = 0
+    download_list.__iter__.return_value = []
+    sf_client = MagicMock()
+    sf_client.get_reported_api_usage.return_value = ApiUsage(Usage(used=50, total=100))
+    downloader = Downloader(sf_client=sf_client)
+    downloader._print_download_msg("[OK] buffered")
+    downloader.download(downloaded_list=downloaded_list, download_list=download_list)
+    assert "[OK] buffered" in capsys.readouterr().out
+
+
 @patch("salesforce_archivist.salesforce.download.sleep", return_value=None)
 def test_downloader_download_or_wait(sleep_mock):
     sf_client = MagicMock()
@@ -482,6 +781,7 @@ def test_downloader_download_or_wait(sleep_mock):
         return api_usage
 
     sf_client.get_api_usage.side_effect = lambda refresh=False: usage_side_effect(refresh=refresh)
+    sf_client.get_reported_api_usage.side_effect = lambda: api_usage
     download_list_mock = MagicMock()
     download_list_mock.__iter__.return_value = []
     with patch.object(Downloader, "download_file_from_sf"):
@@ -546,3 +846,78 @@ def test_download_stats_combine():
     assert stats.processed == 4
     assert stats.errors == 1
     assert stats.size == 42
+
+
+@patch("concurrent.futures.ThreadPoolExecutor")
+def test_downloader_download_will_use_default_workers(thread_pool_mock):
+    archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
+    link_list = ContentDocumentLinkList(data_dir=archivist_obj.obj_dir)
+    version_list = ContentVersionList(data_dir=archivist_obj.obj_dir)
+    download_content_version_list = DownloadContentVersionList(
+        document_link_list=link_list, content_version_list=version_list, data_dir=archivist_obj.obj_dir
+    )
+    downloaded_version_list = DownloadedList(data_dir=archivist_obj.obj_dir, file_name="downloaded_versions.csv")
+    downloader = Downloader(sf_client=Mock())
+    downloader.download(downloaded_list=downloaded_version_list, download_list=download_content_version_list)
+    assert thread_pool_mock.call_args == call(max_workers=DEFAULT_MAX_WORKERS)
+
+
+def test_adaptive_concurrency_will_start_at_max_limit():
+    concurrency = AdaptiveConcurrency(max_limit=5, max_api_usage_percent=50)
+    assert concurrency.limit == 5
+
+
+def test_adaptive_concurrency_will_grow_limit_when_api_usage_is_low():
+    concurrency = AdaptiveConcurrency(max_limit=4, max_api_usage_percent=50, initial_limit=2, window=1)
+    concurrency.acquire()
+    concurrency.release(size=10, api_usage_percent=10)
+    assert concurrency.limit == 3
+
+
+def test_adaptive_concurrency_will_shrink_limit_when_api_usage_is_high():
+    concurrency = AdaptiveConcurrency(max_limit=4, max_api_usage_percent=50, window=1)
+    for _ in range(3):
+        concurrency.acquire()
+        concurrency.release(size=10, api_usage_percent=46)
+    assert concurrency.limit == 1
+
+
+@patch("salesforce_archivist.salesforce.download.monotonic")
+def test_adaptive_concurrency_will_roll_back_increase_when_throughput_drops(monotonic_mock):
+    monotonic_mock.side_effect = [0.0, 1.0, 2.0]
+    concurrency = AdaptiveConcurrency(max_limit=4, initial_limit=2, window=1)
+    concurrency.acquire()
+    concurrency.release(size=100)
+    assert concurrency.limit == 3
+    concurrency.acquire()
+    concurrency.release(size=10)
+    assert concurrency.limit == 2
+
+
+@patch("salesforce_archivist.salesforce.download.monotonic")
+def test_adaptive_concurrency_will_keep_increase_when_throughput_holds(monotonic_mock):
+    monotonic_mock.side_effect = [0.0, 1.0, 2.0]
+    concurrency = AdaptiveConcurrency(max_limit=4, initial_limit=2, window=1)
+    concurrency.acquire()
+    concurrency.release(size=100)
+    concurrency.acquire()
+    # small dip stays within tolerance
+    concurrency.release(size=80)
+    assert concurrency.limit == 4
+
+
+@patch("salesforce_archivist.salesforce.download.monotonic")
+def test_adaptive_concurrency_will_ignore_throughput_drops_not_caused_by_increase(monotonic_mock):
+    monotonic_mock.side_effect = [0.0, 1.0, 2.0, 3.0]
+    concurrency = AdaptiveConcurrency(max_limit=4, window=1)
+    for size in (5_000_000, 10_000, 10_000):
+        concurrency.acquire()
+        concurrency.release(size=size)
+        assert concurrency.limit == 4
+
+
+def test_adaptive_concurrency_will_keep_limit_in_bounds():
+    concurrency = AdaptiveConcurrency(max_limit=2, initial_limit=2, window=1)
+    concurrency.acquire()
+    concurrency.release(size=10)
+    assert concurrency.limit == 2
@@ -469,6 +469,10 @@ def test_download_content_version_list_csv_reading(
             content_version_list=content_version_list,
         )
         content_version_list.add_version.assert_has_calls(add_version_calls, any_order=True)
+        assert client.bulk2.call_args.kwargs["query"] == (
+            "SELECT Id, ContentDocumentId, Checksum, Title, FileExtension, VersionNumber, ContentSize "
+            "FROM ContentVersion WHERE ContentDocumentId IN ('DOC_1','DOC_2') AND ContentSize > 1"
+        )
 
 
 @patch.object(Salesforce, "download_content_version_list")
@@ -493,7 +497,7 @@ def test_load_content_version_list_will_call_download_and_save(save_mock, exist_
         salesforce = Salesforce(archivist_obj=archivist_obj, client=client, max_api_usage_percent=50)
         ret_val = salesforce.load_content_version_list(document_link_list=doc_link_list, batch_size=10)
         assert isinstance(ret_val, ContentVersionList)
-        download_mock.assert_called_once_with(document_ids=doc_ids, content_version_list=ANY)
+        download_mock.assert_called_once_with(document_ids=doc_ids, content_version_list=ANY, tmp_dir_name=ANY)
         save_mock.assert_called_once()
 
 
@@ -538,10 +542,32 @@ def test_load_content_version_list_will_call_download_in_batches(save_mock, exis
         assert isinstance(ret_val, ContentVersionList)
         download_mock.assert_has_calls(
             calls=[
-                call(document_ids=["DID0"], content_version_list=ANY),
-                call(document_ids=["DID1"], content_version_list=ANY),
-                call(document_ids=["DID2"], content_version_list=ANY),
-            ]
+                call(document_ids=["DID0"], content_version_list=ANY, tmp_dir_name=os.path.join("tmp", "1")),
+                call(document_ids=["DID1"], content_version_list=ANY, tmp_dir_name=os.path.join("tmp", "2")),
+                call(document_ids=["DID2"], content_version_list=ANY, tmp_dir_name=os.path.join("tmp", "3")),
+            ],
+            any_order=True,
+        )
+
+
+@patch.object(Salesforce, "download_content_version_list")
+@patch.object(ContentVersionList, "data_file_exist", return_value=False)
+@patch.object(ContentVersionList, "save", return_value=None)
+def test_load_content_version_list_will_query_each_document_once(save_mock, exist_mock, download_mock):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archivist_obj = ArchivistObject(data_dir=tmp_dir, obj_type="User")
+        link_list = [
+            ContentDocumentLink(linked_entity_id="LID0", content_document_id="DID0"),
+            ContentDocumentLink(linked_entity_id="LID1", content_document_id="DID0"),
+            ContentDocumentLink(linked_entity_id="LID1", content_document_id="DID1"),
+        ]
+        doc_link_list = MagicMock()
+        doc_link_list.__iter__.return_value = link_list
+        client = SalesforceApiClient(sf_client=Mock())
+        salesforce = Salesforce(archivist_obj=archivist_obj, client=client, max_api_usage_percent=50)
+        salesforce.load_content_version_list(document_link_list=doc_link_list, batch_size=10)
+        download_mock.assert_called_once_with(
+            document_ids=["DID0", "DID1"], content_version_list=ANY, tmp_dir_name=os.path.join("tmp", "1")
         )
 
 
@@ -2,7 +2,7 @@ import concurrent.futures
 import hashlib
 import os
 import tempfile
-from unittest.mock import patch, call
+from unittest.mock import patch, call, MagicMock
 
 import pytest
 
@@ -10,14 +10,19 @@ from salesforce_archivist.archivist import ArchivistObject
 from salesforce_archivist.salesforce.attachment import Attachment
 from salesforce_archivist.salesforce.content_document_link import ContentDocumentLinkList, ContentDocumentLink
 from salesforce_archivist.salesforce.content_version import ContentVersionList, ContentVersion
-from salesforce_archivist.salesforce.download import DownloadContentVersionList
-from test.salesforce.helper import gen_csv
-
+from salesforce_archivist.salesforce.download import (
+    DownloadContentVersionList,
+    DownloadedList,
+    DownloadedSalesforceObject,
+    OUTPUT_FLUSH_SEC,
+)
 from salesforce_archivist.salesforce.validation import (
     ValidationStats,
     ValidatedList,
     DownloadValidator,
     ValidatedFile,
+    DEFAULT_MAX_WORKERS,
+    VALIDATED_LIST_HEADER,
 )
 
 
@@ -48,38 +53,49 @@ def test_validated_list_data_file_exist(exists_mock):
 
 
 @pytest.mark.parametrize(
-    "csv_data",
+    "csv_text, expected",
     [
-        [
-            [
-                ["Checksum", "Content Size", "Path"],
-            ],
-        ],
-        [
-            [
-                ["Checksum", "Content Size", "Path"],
-                ["data/path/file_1.txt", "", "checksum1"],
-                ["data/path/file_2.txt", "20", ""],
-            ],
-        ],
+        ("Checksum,Content Size,Path\n", {}),
+        (
+            # legacy file without modified time column, last row cut off when process was killed
+            "Checksum,Content Size,Path\n"
+            "checksum1,,data/path/file_1.txt\n"
+            ",20,data/path/file_2.txt\n"
+            "checksum3,3,data/pa",
+            {
+                "data/path/file_1.txt": ("checksum1", None, None),
+                "data/path/file_2.txt": (None, 20, None),
+            },
+        ),
+        (
+            "Checksum,Content Size,Path,Modified Time\n"
+            "checksum1,10,data/path/file_1.txt,123\n"
+            ",20,data/path/file_2.txt,\n"
+            "checksum3,30,data/path/file_1.txt,456\n"
+            "checksum4,4,data/pa",
+            {
+                "data/path/file_1.txt": ("checksum3", 30, 456),
+                "data/path/file_2.txt": (None, 20, None),
+            },
+        ),
     ],
 )
-def test_validated_list_load_data_from_file(csv_data):
+def test_validated_list_load_data_from_file(csv_text, expected):
     with tempfile.TemporaryDirectory() as tmp_dir:
-        with patch.object(ValidatedList, "add") as add_mock:
-            validated_list = ValidatedList(data_dir=tmp_dir)
-            gen_csv(data=csv_data, path=validated_list.path)
-            validated_list.load_data_from_file()
-            expected_calls = []
-            for i, row in enumerate(csv_data):
-                if not i:
-                    continue
-                checksum = row[0] if row[0] != "" else None
-                size = int(row[1]) if row[1] != "" else None
-                expected_calls.append(
-                    call(validated_file=ValidatedFile(checksum=checksum, content_size=size, path=row[2]))
-                )
-            assert add_mock.mock_calls == expected_calls
+        validated_list = ValidatedList(data_dir=tmp_dir)
+        with open(validated_list.path, "w") as file:
+            file.write(csv_text)
+        validated_list.load_data_from_file()
+        assert len(validated_list) == len(expected)
+        for path, (checksum, content_size, modified_time_ns) in expected.items():
+            loaded = validated_list.get(path=path)
+            assert loaded.path == path
+            assert (loaded.checksum, loaded.content_size, loaded.modified_time_ns) == (
+                checksum,
+                content_size,
+                modified_time_ns,
+            )
+        assert validated_list.get(path="data/pa") is None
 
 
 def test_validated_list_save():
@@ -87,7 +103,7 @@ def test_validated_list_save():
         validated_list = ValidatedList(data_dir=tmp_dir)
         to_save = [
             ValidatedFile(checksum="checksum1", path="data/path/file_1.txt", content_size=None),
-            ValidatedFile(checksum=None, path="data/path/file_2.txt", content_size=10),
+            ValidatedFile(checksum=None, path="data/path/file_2.txt", content_size=10, modified_time_ns=123),
         ]
         for validated_file in to_save:
             validated_list.add(validated_file=validated_file)
@@ -97,6 +113,66 @@ def test_validated_list_save():
         assert len(loaded_list) == len(to_save)
         for validated_file in to_save:
             assert validated_file == loaded_list.get(path=validated_file.path)
+            assert validated_file.modified_time_ns == loaded_list.get(path=validated_file.path).modified_time_ns
+
+
+def test_validated_list_add_will_save_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        validated_list = ValidatedList(data_dir=tmp_dir, checkpoint_size=2)
+        for i in range(3):
+            validated_list.add(ValidatedFile(path="path/{}".format(i), checksum="checksum", content_size=None))
+        checkpoint_list = ValidatedList(data_dir=tmp_dir)
+        checkpoint_list.load_data_from_file()
+        assert len(checkpoint_list) == 2
+        validated_list.save()
+        saved_list = ValidatedList(data_dir=tmp_dir)
+        saved_list.load_data_from_file()
+        assert len(saved_list) == 3
+
+
+def test_validated_list_load_will_skip_broken_rows_and_rewrite_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        validated_list = ValidatedList(data_dir=tmp_dir, checkpoint_size=1)
+        with open(validated_list.path, "w") as file:
+            # last row was cut off when process was killed during checkpoint
+            file.write("Checksum,Content Size,Path,Modified Time\nc1,4,path/1,5\nc2\nc3,x,path/3,1\nc4,1,pa")
+        validated_list.load_data_from_file()
+        assert len(validated_list) == 1
+        validated_list.add(ValidatedFile(path="path/5", checksum="c5", content_size=None))
+        with open(validated_list.path) as file:
+            assert file.read().splitlines() == [",".join(VALIDATED_LIST_HEADER), "c1,4,path/1,5", "c5,,path/5,"]
+
+
+def test_validated_list_will_upgrade_legacy_header():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        validated_list = ValidatedList(data_dir=tmp_dir, checkpoint_size=1)
+        with open(validated_list.path, "w") as file:
+            file.write("Checksum,Content Size,Path\nc1,4,path/1\n")
+        validated_list.load_data_from_file()
+        validated_list.add(ValidatedFile(path="path/2", checksum="c2", content_size=1, modified_time_ns=2))
+        with open(validated_list.path) as file:
+            assert file.read().splitlines() == [",".join(VALIDATED_LIST_HEADER), "c1,4,path/1,", "c2,1,path/2,2"]
+
+
+def test_validated_list_save_will_append_or_compact():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        validated_list = ValidatedList(data_dir=tmp_dir)
+        validated_list.add(ValidatedFile(path="path/1", checksum="checksum", content_size=None))
+        validated_list.save()
+        loaded_list = ValidatedList(data_dir=tmp_dir)
+        loaded_list.load_data_from_file()
+        loaded_list.add(ValidatedFile(path="path/2", checksum="checksum", content_size=None))
+        with patch("os.replace") as replace_mock:
+            loaded_list.save()
+            replace_mock.assert_not_called()
+        for i in range(3):
+            loaded_list.add(ValidatedFile(path="path/1", checksum="checksum{}".format(i), content_size=None))
+        loaded_list.save()
+        with open(loaded_list.path) as file:
+            assert len(file.readlines()) == 3
+        saved_list = ValidatedList(data_dir=tmp_dir)
+        saved_list.load_data_from_file()
+        assert saved_list.get(path="path/1").checksum == "checksum2"
 
 
 def test_validated_list_add_get_version():
@@ -194,6 +270,54 @@ def test_download_validator_validate_will_validate_in_parallel(submit_mock):
     assert submit_mock.call_count == 2
 
 
+@patch.object(concurrent.futures.ThreadPoolExecutor, "submit")
+def test_download_validator_validate_will_skip_validated_files(submit_mock, tmp_path):
+    version_ok = ContentVersion(
+        version_id="VID1",
+        document_id="DID",
+        checksum="abc",
+        extension="ext1",
+        title="version1",
+        version_number=1,
+        content_size=10,
+    )
+    version_changed = ContentVersion(
+        version_id="VID2",
+        document_id="DID",
+        checksum="xyz",
+        extension="ext1",
+        title="version1",
+        version_number=2,
+        content_size=10,
+    )
+    path_ok = str(tmp_path / "ok")
+    path_changed = str(tmp_path / "changed")
+    path_removed = str(tmp_path / "removed")
+    path_new = str(tmp_path / "new")
+    path_modified = str(tmp_path / "modified")
+    for path in [path_ok, path_changed, path_new, path_modified]:
+        with open(path, "wb"):
+            pass
+    validated_list = ValidatedList(data_dir=str(tmp_path))
+    validated_list.add(ValidatedFile(path=path_ok, checksum="abc", content_size=None))
+    validated_list.add(ValidatedFile(path=path_changed, checksum="abc", content_size=None))
+    validated_list.add(ValidatedFile(path=path_removed, checksum="abc", content_size=None))
+    validated_list.add(ValidatedFile(path=path_modified, checksum="abc", content_size=0, modified_time_ns=1))
+    download_list = MagicMock()
+    download_list.__len__.return_value = 5
+    download_list.__iter__.return_value = [
+        (version_ok, path_ok),
+        (version_changed, path_changed),
+        (version_ok, path_removed),
+        (version_ok, path_new),
+        (version_ok, path_modified),
+    ]
+    validator = DownloadValidator(validated_list=validated_list)
+    stats = validator.validate(download_list=download_list)
+    assert submit_mock.call_count == 4
+    assert stats.processed == 1
+
+
 @patch("concurrent.futures.ThreadPoolExecutor")
 def test_download_validator_validate_will_use_defined_workers(thread_pool_mock):
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
@@ -209,6 +333,19 @@ def test_download_validator_validate_will_use_defined_workers(thread_pool_mock):
     assert thread_pool_mock.call_args == call(max_workers=max_workers)
 
 
+@patch("concurrent.futures.ThreadPoolExecutor")
+def test_download_validator_validate_will_use_default_workers(thread_pool_mock):
+    archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
+    link_list = ContentDocumentLinkList(data_dir=archivist_obj.obj_dir)
+    version_list = ContentVersionList(data_dir=archivist_obj.obj_dir)
+    download_list = DownloadContentVersionList(
+        document_link_list=link_list, content_version_list=version_list, data_dir=archivist_obj.obj_dir
+    )
+    validator = DownloadValidator(validated_list=ValidatedList(data_dir=archivist_obj.obj_dir))
+    validator.validate(download_list=download_list)
+    assert thread_pool_mock.call_args == call(max_workers=DEFAULT_MAX_WORKERS)
+
+
 @patch.object(concurrent.futures.ThreadPoolExecutor, "submit", side_effect=KeyboardInterrupt)
 @patch.object(concurrent.futures.ThreadPoolExecutor, "shutdown", return_value=None)
 def test_download_validator_validate_will_gracefully_shutdown(shutdown_mock, submit_mock):
@@ -259,16 +396,18 @@ def test_download_validator_validate_will_gracefully_shutdown(shutdown_mock, sub
         ),
     ],
 )
-def test_download_validator_validate_object_will_find_missing_file(obj_type, object_to_validate):
+def test_download_validator_validate_object_will_find_missing_file(obj_type, object_to_validate, capsys):
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type=obj_type)
     validated_list = ValidatedList(data_dir=archivist_obj.obj_dir)
     validator = DownloadValidator(validated_list=validated_list)
     assert not validator.validate_object(obj=object_to_validate, download_path="/non/existing/path")
+    assert "File does not exist: /non/existing/path" in capsys.readouterr().out
+    assert validated_list.get("/non/existing/path") is None
 
 
-@patch("os.path.exists", return_value=True)
-def test_download_validator_validate_object_will_check_validated_version_checksum(exists_mock):
-    archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
+@patch.object(DownloadValidator, "_calculate_md5")
+def test_download_validator_validate_object_will_check_validated_version_checksum(md5_mock, tmp_path):
+    archivist_obj = ArchivistObject(data_dir=str(tmp_path), obj_type="User")
     version_fail = ContentVersion(
         version_id="VID1",
         document_id="DID",
@@ -288,21 +427,109 @@ def test_download_validator_validate_object_will_check_validated_version_checksu
         content_size=10,
     )
     validated_list = ValidatedList(data_dir=archivist_obj.obj_dir)
-    validated_path = "/path/to/file"
-    validated_list.add(ValidatedFile(path=validated_path, checksum="abc", content_size=None))
+    validated_path = str(tmp_path / "file")
+    with open(validated_path, "wb") as file:
+        file.write(b"0123456789")
+    file_stat = os.stat(validated_path)
+    validated_list.add(
+        ValidatedFile(
+            path=validated_path,
+            checksum="abc",
+            content_size=file_stat.st_size,
+            modified_time_ns=file_stat.st_mtime_ns,
+        )
+    )
     validator = DownloadValidator(validated_list=validated_list)
     assert not validator.validate_object(obj=version_fail, download_path=validated_path)
     assert validator.validate_object(obj=version_ok, download_path=validated_path)
+    md5_mock.assert_not_called()
+
+
+@patch.object(DownloadValidator, "_calculate_md5", return_value="xyz")
+def test_download_validator_validate_object_will_recalculate_checksum_of_changed_file(md5_mock, tmp_path):
+    version = ContentVersion(
+        version_id="VID1",
+        document_id="DID",
+        checksum="xyz",
+        extension="ext1",
+        title="version1",
+        version_number=1,
+        content_size=10,
+    )
+    validated_list = ValidatedList(data_dir=str(tmp_path))
+    validated_path = str(tmp_path / "file")
+    with open(validated_path, "wb") as file:
+        file.write(b"0123456789")
+    file_stat = os.stat(validated_path)
+    validated_list.add(
+        ValidatedFile(
+            path=validated_path,
+            checksum="abc",
+            content_size=file_stat.st_size,
+            modified_time_ns=file_stat.st_mtime_ns - 1,
+        )
+    )
+    validator = DownloadValidator(validated_list=validated_list)
+    assert validator.validate_object(obj=version, download_path=validated_path)
+    md5_mock.assert_called_once_with(validated_path)
+    assert validated_list.get(validated_path).checksum == "xyz"
+    assert validated_list.get(validated_path).modified_time_ns == file_stat.st_mtime_ns
+
+
+@patch.object(DownloadValidator, "_calculate_md5", return_value="xyz")
+def test_download_validator_validate_object_will_use_checksum_from_download(md5_mock, tmp_path):
+    version = ContentVersion(
+        version_id="VID1",
+        document_id="DID",
+        checksum="xyz",
+        extension="ext1",
+        title="version1",
+        version_number=1,
+        content_size=10,
+    )
+    download_path = str(tmp_path / "file")
+    with open(download_path, "wb") as file:
+        file.write(b"0123456789")
+    file_stat = os.stat(download_path)
+    downloaded_list = DownloadedList(data_dir=str(tmp_path), file_name="downloaded_versions.csv")
+    downloaded_list.add(
+        DownloadedSalesforceObject(
+            obj_id=version.id,
+            path=download_path,
+            checksum="xyz",
+            content_size=file_stat.st_size,
+            modified_time_ns=file_stat.st_mtime_ns,
+        )
+    )
+    validated_list = ValidatedList(data_dir=str(tmp_path))
+    validator = DownloadValidator(validated_list=validated_list, downloaded_list=downloaded_list)
+    assert validator.validate_object(obj=version, download_path=download_path)
+    md5_mock.assert_not_called()
+    assert validated_list.get(download_path).checksum == "xyz"
+
+    # file changed after it was downloaded
+    downloaded_list.add(
+        DownloadedSalesforceObject(
+            obj_id=version.id,
+            path=download_path,
+            checksum="abc",
+            content_size=file_stat.st_size,
+            modified_time_ns=file_stat.st_mtime_ns - 1,
+        )
+    )
+    validator = DownloadValidator(validated_list=ValidatedList(data_dir=str(tmp_path)), downloaded_list=downloaded_list)
+    assert validator.validate_object(obj=version, download_path=download_path)
+    md5_mock.assert_called_once_with(download_path)
 
 
-@patch("os.path.exists", return_value=True)
-def test_download_validator_validate_object_will_check_validated_attachment_file_size(exists_mock):
-    archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="Attachment")
+def test_download_validator_validate_object_will_check_attachment_file_size(tmp_path):
+    archivist_obj = ArchivistObject(data_dir=str(tmp_path), obj_type="Attachment")
     attachment_fail = Attachment(attachment_id="AID", parent_id="PID", name="name", content_size=20)
     attachment_ok = Attachment(attachment_id="AID", parent_id="PID", name="name", content_size=10)
     validated_list = ValidatedList(data_dir=archivist_obj.obj_dir)
-    validated_path = "/path/to/file"
-    validated_list.add(ValidatedFile(path=validated_path, checksum=None, content_size=10))
+    validated_path = str(tmp_path / "file")
+    with open(validated_path, "wb") as file:
+        file.write(b"0123456789")
     validator = DownloadValidator(validated_list=validated_list)
     assert not validator.validate_object(obj=attachment_fail, download_path=validated_path)
     assert validator.validate_object(obj=attachment_ok, download_path=validated_path)
@@ -331,7 +558,7 @@ def test_download_validator_validate_object_will_calculate_checksum_and_check_ve
             extension="ext1",
             title="version1",
             version_number=1,
-            content_size=10,
+            content_size=len(file_data),
         )
         validated_list = ValidatedList(data_dir=archivist_obj.obj_dir)
         validator = DownloadValidator(validated_list=validated_list)
@@ -339,6 +566,27 @@ def test_download_validator_validate_object_will_calculate_checksum_and_check_ve
         assert len(validated_list) == 1
 
 
+@patch.object(DownloadValidator, "_calculate_md5")
+def test_download_validator_validate_object_will_not_calculate_checksum_on_size_mismatch(md5_mock, tmp_path):
+    download_path = str(tmp_path / "file.txt")
+    with open(download_path, "wb") as file:
+        file.write(b"test")
+    version = ContentVersion(
+        version_id="VID1",
+        document_id="DID",
+        checksum=hashlib.md5(b"test").hexdigest(),
+        extension="ext1",
+        title="version1",
+        version_number=1,
+        content_size=10,
+    )
+    validated_list = ValidatedList(data_dir=str(tmp_path))
+    validator = DownloadValidator(validated_list=validated_list)
+    assert not validator.validate_object(obj=version, download_path=download_path)
+    md5_mock.assert_not_called()
+    assert validated_list.get(download_path).content_size == 4
+
+
 @pytest.mark.parametrize(
     "file_data, size, should_match",
     [
@@ -382,7 +630,7 @@ def test_download_validator_validate_object_will_update_validated_list():
             extension="ext1",
             title="version1",
             version_number=1,
-            content_size=10,
+            content_size=data_size,
         )
         attachment = Attachment(attachment_id="AID", parent_id="PID", name="name", content_size=data_size)
         validated_list = ValidatedList(data_dir=archivist_obj.obj_dir)
@@ -394,8 +642,8 @@ def test_download_validator_validate_object_will_update_validated_list():
         assert validated_list.get(download_path_attachment).content_size == data_size
 
 
-@patch("os.path.exists", side_effect=RuntimeError("Test error"))
-def test_download_validator_validate_object_will_return_invalid_on_exception(exists_mock):
+@patch("os.stat", side_effect=RuntimeError("Test error"))
+def test_download_validator_validate_object_will_return_invalid_on_exception(stat_mock):
     archivist_obj = ArchivistObject(data_dir="/fake/dir", obj_type="User")
     version = ContentVersion(
         version_id="VID1",
@@ -411,3 +659,59 @@ def test_download_validator_validate_object_will_return_invalid_on_exception(exi
     validator = DownloadValidator(validated_list=validated_list)
     assert not validator.validate_object(obj=version, download_path="/fake/path/download")
     assert not validator.validate_object(obj=attachment, download_path="/fake/path/download")
+
+
+@pytest.mark.parametrize("mmap_min_size", [1, 10 * 1024 * 1024])
+@pytest.mark.parametrize(
+    "file_data",
+    [b"", b"test", os.urandom(3 * 1024 * 1024 + 17)],
+)
+def test_download_validator_calculate_md5(file_data: bytes, mmap_min_size: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "file.txt")
+        with open(path, "wb") as file:
+            file.write(file_data)
+        with patch("salesforce_archivist.salesforce.validation.HASH_MMAP_MIN_SIZE", mmap_min_size):
+            assert DownloadValidator._calculate_md5(path) == hashlib.md5(file_data).hexdigest()
+
+
+@patch("salesforce_archivist.salesforce.validation.monotonic", return_value=0.0)
+def test_download_validator_will_print_messages_in_batches(monotonic_mock, capsys):
+    validator = DownloadValidator(validated_list=ValidatedList(data_dir="/fake/dir"))
+    validator._print_validated_msg("[ OK ] first")
+    assert capsys.readouterr().out == ""
+    validator._print_validated_msg("[ KO ] second", invalid=True)
+    output = capsys.readouterr().out.splitlines()
+    assert len(output) == 2
+    assert output[0].endswith("[ OK ] first")
+    assert output[1].endswith("[ KO ] second")
+    validator._print_validated_msg("[ OK ] third")
+    assert capsys.readouterr().out == ""
+    monotonic_mock.return_value = OUTPUT_FLUSH_SEC
+    validator._print_validated_msg("[ OK ] fourth")
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+@patch.object(concurrent.futures.ThreadPoolExecutor, "submit")
+def test_download_validator_validate_will_flush_messages(submit_mock, capsys):
+    validated_list = ValidatedList(data_dir="/fake/dir")
+    download_list = MagicMock()
+    download_list.__len__.return_value = 0
+    download_list.__iter__.return_value = []
+    validator = DownloadValidator(validated_list=validated_list)
+    validator._print_validated_msg("[ OK ] buffered")
+    validator.validate(download_list=download_list)
+    assert "[ OK ] buffered" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="posix_fadvise not available")
+def test_download_validator_calculate_md5_will_advise_kernel_about_reads(tmp_path):
+    path = str(tmp_path / "file.txt")
+    with open(path, "wb") as file:
+        file.write(b"test")
+    with patch("os.posix_fadvise") as fadvise_mock:
+        assert DownloadValidator._calculate_md5(path) == hashlib.md5(b"test").hexdigest()
+    assert [advise_call.args[3] for advise_call in fadvise_mock.call_args_list] == [
+        os.POSIX_FADV_SEQUENTIAL,
+        os.POSIX_FADV_DONTNEED,
+    ]
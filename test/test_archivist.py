@@ -1,7 +1,10 @@
 import datetime
 import os.path
+import signal
 import tempfile
 import textwrap
+import threading
+import time
 from unittest.mock import patch, MagicMock, call, ANY
 
 import pytest
@@ -10,7 +13,8 @@ from pydantic import ValidationError
 
 from salesforce_archivist.archivist import ArchivistObject, ArchivistAuth, ArchivistConfig, Archivist
 from salesforce_archivist.salesforce.download import DownloadedList, DownloadStats
-from salesforce_archivist.salesforce.salesforce import Salesforce
+from salesforce_archivist.salesforce.api import SalesforceApiClient
+from salesforce_archivist.salesforce.salesforce import BULK_MAX_WORKERS, Salesforce
 from salesforce_archivist.salesforce.validation import ValidationStats, ValidatedList
 
 
@@ -77,6 +81,14 @@ def test_archivist_object_quality():
     assert archivist_obj != archivist_obj_same_different
 
 
+def test_archivist_object_is_immutable():
+    archivist_obj = ArchivistObject(data_dir="data/dir", obj_type="User")
+    assert archivist_obj.obj_dir is archivist_obj.obj_dir
+    with pytest.raises(ValidationError):
+        archivist_obj.data_dir = "other/dir"
+    assert archivist_obj.obj_dir == os.path.join("data/dir", "User")
+
+
 def test_archivist_auth_props():
     (instance_url, username, consumer_key, private_key) = (
         "http://exmple.com",
@@ -93,6 +105,8 @@ def test_archivist_auth_props():
         auth.consumer_key,
         auth.private_key,
     )
+    with pytest.raises(ValidationError):
+        auth.username = "other"
 
 
 @pytest.mark.parametrize(
@@ -215,16 +229,44 @@ def test_archivist_config_props():
         )
 
 
-@patch.object(DownloadedList, "data_file_exist", side_effect=[False, False, True, True])
-@patch.object(DownloadedList, "load_data_from_file")
-def test_archivist_download_will_load_downloaded_list_if_possible(load_mock, exist_mock):
+def test_archivist_config_from_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, "config.yaml")
+        with open(config_path, "w") as file:
+            file.write(
+                textwrap.dedent(
+                    """\
+                    data_dir: {data_dir}
+                    modified_date_gt: 2011-01-01T00:00:00Z
+                    auth:
+                      instance_url: https://login.salesforce.com/
+                      username: test
+                      consumer_key: abc
+                      private_key: !!binary |
+                        dGVzdAo=
+
+                    objects:
+                      User:
+                        dir_name_field: LinkedEntity.Username
+                    """
+                ).format(data_dir=tmp_dir)
+            )
+        config = ArchivistConfig.from_file(config_path)
+        assert config.auth.private_key == "test\n"
+        assert config.objects["User"].modified_date_gt == datetime.datetime(
+            year=2011, month=1, day=1, tzinfo=datetime.timezone.utc
+        )
+        # no other copy of credentials is written next to config
+        assert os.listdir(tmp_dir) == ["config.yaml"]
+
+
+@patch.object(DownloadedList, "load_data_from_file", side_effect=[FileNotFoundError, FileNotFoundError, None, None])
+def test_archivist_download_will_load_downloaded_list_if_possible(load_mock):
     archivist = Archivist(data_dir="/fake/dir", objects={}, sf_client=MagicMock())
-    archivist.download()
-    assert exist_mock.call_count == 2
-    load_mock.assert_not_called()
-    archivist.download()
-    assert exist_mock.call_count == 4
+    assert archivist.download()
     assert load_mock.call_count == 2
+    assert archivist.download()
+    assert load_mock.call_count == 4
 
 
 @patch.object(Salesforce, "load_attachment_list")
@@ -248,6 +290,131 @@ def test_archivist_download_will_load_lists_and_call_download_method(
     assert download_mock.call_count == 3
 
 
+@patch.object(Salesforce, "load_attachment_list")
+@patch.object(Salesforce, "load_content_document_link_list")
+@patch.object(Salesforce, "load_content_version_list")
+@patch.object(Salesforce, "validate_download")
+@patch.object(Salesforce, "download_files")
+def test_archivist_download_will_validate_downloaded_lists(
+    download_mock, validate_mock, load_version_list_mock, load_doc_link_list_mock, load_attachment_list_mock
+):
+    failed_stats = DownloadStats()
+    failed_stats.add_processed(size=1, error=True)
+    download_mock.side_effect = [DownloadStats(), failed_stats]
+    validate_mock.return_value = ValidationStats()
+    objects = {
+        "User": ArchivistObject(data_dir="/fake/dir", obj_type="User"),
+        "Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment"),
+    }
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client=MagicMock())
+    assert not archivist.download(validate=True)
+    assert load_doc_link_list_mock.call_count == 1
+    assert load_attachment_list_mock.call_count == 1
+    # attachments failed to download, so only user files are validated, using the same download list
+    validate_mock.assert_called_once()
+    assert validate_mock.call_args.kwargs["download_list"] is download_mock.call_args_list[0].kwargs["download_list"]
+
+
+@patch.object(Salesforce, "load_attachment_list")
+@patch.object(Salesforce, "load_content_document_link_list")
+@patch.object(Salesforce, "load_content_version_list")
+@patch.object(Salesforce, "download_files")
+def test_archivist_download_will_load_next_object_lists_while_downloading(
+    download_mock, load_version_list_mock, load_doc_link_list_mock, load_attachment_list_mock
+):
+    next_list_loaded = threading.Event()
+    load_attachment_list_mock.side_effect = lambda: next_list_loaded.set()
+    loaded_during_download = []
+
+    def download(**kwargs):
+        if not loaded_during_download:
+            loaded_during_download.append(next_list_loaded.wait(timeout=5))
+        return DownloadStats()
+
+    download_mock.side_effect = download
+    objects = {
+        "User": ArchivistObject(data_dir="/fake/dir", obj_type="User"),
+        "Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment"),
+    }
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client=MagicMock())
+    assert archivist.download()
+    assert loaded_during_download == [True]
+    assert download_mock.call_count == 2
+
+
+@patch.object(Salesforce, "load_attachment_list")
+@patch.object(Salesforce, "load_content_document_link_list")
+@patch.object(Salesforce, "load_content_version_list")
+@patch.object(Salesforce, "validate_download")
+def test_archivist_validate_will_load_next_object_lists_while_validating(
+    validate_mock, load_version_list_mock, load_doc_link_list_mock, load_attachment_list_mock
+):
+    next_list_loaded = threading.Event()
+    load_attachment_list_mock.side_effect = lambda: next_list_loaded.set()
+    loaded_during_validation = []
+
+    def validate(**kwargs):
+        if not loaded_during_validation:
+            loaded_during_validation.append(next_list_loaded.wait(timeout=5))
+        return ValidationStats()
+
+    validate_mock.side_effect = validate
+    objects = {
+        "User": ArchivistObject(data_dir="/fake/dir", obj_type="User"),
+        "Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment"),
+    }
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client=MagicMock())
+    assert archivist.validate()
+    assert loaded_during_validation == [True]
+    assert validate_mock.call_count == 2
+
+
+@patch.object(Archivist, "_load_download_list")
+def test_archivist_prefetch_download_lists_can_be_interrupted(load_mock):
+    release_load = threading.Event()
+    load_mock.side_effect = lambda archivist_obj: (
+        release_load.wait(timeout=5) if archivist_obj.obj_type == "User" else []
+    )
+    objects = {
+        "Account": ArchivistObject(data_dir="/fake/dir", obj_type="Account"),
+        "User": ArchivistObject(data_dir="/fake/dir", obj_type="User"),
+    }
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client=MagicMock())
+    prefetch = archivist._prefetch_download_lists()
+    assert next(prefetch)[0] == objects["Account"]
+    # interrupt main thread like Ctrl-C would, while it waits for list of the next object
+    interrupt = threading.Timer(0.1, signal.pthread_kill, args=(threading.main_thread().ident, signal.SIGINT))
+    interrupt.start()
+    start = time.monotonic()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            next(prefetch)
+        assert time.monotonic() - start < 2
+    finally:
+        interrupt.join()
+        release_load.set()
+
+
+@patch("salesforce_archivist.archivist.Salesforce")
+def test_archivist_will_share_api_client_between_objects(salesforce_mock):
+    salesforce_mock.return_value.download_files.return_value = DownloadStats()
+    objects = {
+        "User": ArchivistObject(data_dir="/fake/dir", obj_type="User"),
+        "Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment"),
+    }
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client=MagicMock())
+    archivist.download()
+    clients = {id(kwargs["client"]) for _, kwargs in salesforce_mock.call_args_list}
+    assert len(clients) == 1
+    assert salesforce_mock.call_count == len(objects)
+
+
+@patch.object(SalesforceApiClient, "configure_connection_pool")
+def test_archivist_will_size_connection_pool_for_downloads_and_bulk_jobs(configure_mock):
+    Archivist(data_dir="/fake/dir", objects={}, sf_client=MagicMock(), max_workers=3)
+    configure_mock.assert_called_once_with(pool_size=3 + BULK_MAX_WORKERS)
+
+
 @patch.object(Salesforce, "load_attachment_list")
 @patch.object(Salesforce, "load_content_document_link_list")
 @patch.object(Salesforce, "load_content_version_list")
@@ -272,16 +439,23 @@ def test_archivist_download_will_return_correct_bool_value(
         assert archivist.download() == expected_return
 
 
-@patch.object(ValidatedList, "data_file_exist", side_effect=[False, True])
-@patch.object(ValidatedList, "load_data_from_file")
-def test_archivist_validate_will_load_validated_list_if_possible(load_mock, exist_mock):
+@patch.object(Salesforce, "load_attachment_list")
+@patch.object(Salesforce, "validate_download", return_value=ValidationStats())
+def test_archivist_validate_will_not_create_salesforce_client(validate_mock, load_attachment_list_mock):
+    sf_client_factory = MagicMock()
+    objects = {"Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment")}
+    archivist = Archivist(data_dir="/fake/dir", objects=objects, sf_client_factory=sf_client_factory)
+    assert archivist.validate()
+    validate_mock.assert_called_once()
+    sf_client_factory.assert_not_called()
+
+
+@patch.object(ValidatedList, "load_data_from_file", side_effect=[FileNotFoundError, None])
+def test_archivist_validate_will_load_validated_list_if_possible(load_mock):
     archivist = Archivist(data_dir="/fake/dir", objects={}, sf_client=MagicMock())
-    archivist.validate()
-    exist_mock.assert_called_once()
-    load_mock.assert_not_called()
-    archivist.validate()
-    assert exist_mock.call_count == 2
-    load_mock.assert_called_once()
+    assert archivist.validate()
+    assert archivist.validate()
+    assert load_mock.call_count == 2
 
 
 @patch.object(Salesforce, "load_attachment_list")
@@ -304,7 +478,21 @@ def test_archivist_validate_will_load_lists_and_call_validate_method(
     assert load_version_list_mock.call_count == 2
     assert load_attachment_list_mock.call_count == 1
     assert validate_mock.mock_calls == [
-        call(download_list=ANY, validated_list=ANY, max_workers=max_workers),
-        call(download_list=ANY, validated_list=ANY, max_workers=max_workers),
-        call(download_list=ANY, validated_list=ANY, max_workers=max_workers),
+        call(download_list=ANY, validated_list=ANY, max_workers=max_workers, downloaded_list=ANY),
+        call(download_list=ANY, validated_list=ANY, max_workers=max_workers, downloaded_list=ANY),
+        call(download_list=ANY, validated_list=ANY, max_workers=max_workers, downloaded_list=None),
+    ]
+
+
+@patch.object(Salesforce, "load_attachment_list")
+@patch.object(Salesforce, "validate_download")
+def test_archivist_validate_will_use_validation_max_workers(validate_mock, load_attachment_list_mock):
+    validate_mock.return_value = ValidationStats()
+    objects = {"Attachment": ArchivistObject(data_dir="/fake/dir", obj_type="Attachment")}
+    archivist = Archivist(
+        data_dir="/fake/dir", objects=objects, sf_client=MagicMock(), max_workers=6, validation_max_workers=2
+    )
+    archivist.validate()
+    assert validate_mock.mock_calls == [
+        call(download_list=ANY, validated_list=ANY, max_workers=2, downloaded_list=None)
     ]